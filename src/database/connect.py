@@ -1,37 +1,219 @@
 import redis.asyncio as redis
 import logging
+import time
 
-from redis_lru import RedisLRU
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Awaitable, Callable, Dict, List
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from src.database.profiler import install_profilers
 from src.services.base import settings
+from src.services.metrics import Histogram, register_collector
 
 logger = logging.getLogger(__name__)
 
-client = redis.StrictRedis(host="redis", port=6379, decode_responses=True)
-cache = RedisLRU(client)
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds", "Redis command round trip", ("command",)
+)
+db_pool_checkout_duration = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time spent waiting for a pooled database connection",
+    ("engine",),
+)
+
+
+class InstrumentedRedis(redis.StrictRedis):
+    """Redis client that records the latency of every single command"""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            redis_command_duration.observe(
+                time.perf_counter() - started, command=str(args[0]).upper()
+            )
+
+
+client = InstrumentedRedis(host="redis", port=6379, decode_responses=True)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_duration.observe(
+                time.perf_counter() - started, engine=self.logging_name
+            )
+
+
+def _create_engine(url: str, name: str):
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+
+engine = _create_engine(settings.DATABASE_URL, "primary")
+# Optional read replica; without one, reads share the primary engine
+read_engine = (
+    _create_engine(settings.DATABASE_REPLICA_URL, "replica")
+    if settings.DATABASE_REPLICA_URL
+    else engine
+)
+
+
+def _pool_metrics():
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines["replica"] = read_engine
+    capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    checked_out = {name: e.pool.checkedout() for name, e in engines.items()}
+    yield (
+        "db_pool_checked_out",
+        "gauge",
+        "Connections currently checked out of the pool",
+        [({"engine": name}, count) for name, count in checked_out.items()],
+    )
+    yield (
+        "db_pool_idle",
+        "gauge",
+        "Open connections waiting in the pool",
+        [({"engine": name}, e.pool.checkedin()) for name, e in engines.items()],
+    )
+    yield (
+        "db_pool_saturation",
+        "gauge",
+        "Checked out connections as a share of pool_size + max_overflow",
+        [({"engine": name}, count / capacity) for name, count in checked_out.items()],
+    )
+
+
+register_collector(_pool_metrics)
+install_profilers(engine, read_engine)
+
+
+class PrimarySession(Session):
+    """Sessions bound to the primary; they record whether they committed"""
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_commit(session):
+    session.info["committed"] = True
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
 
 async_session = sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=PrimarySession,
     autocommit=False,
     expire_on_commit=False,
     autoflush=False,
 )
 
-Base = declarative_base()
+read_session = sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    autocommit=False,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
+
+class ReadYourWrites:
+    """Pins a user's reads to the primary for a short window after a write.
+
+    The pin is kept locally for the worker that served the write and in
+    Redis for every other worker, so replica lag is never observed by the
+    user who caused it.
+    """
+
+    def __init__(self, redis_client, window: float):
+        self.redis = redis_client
+        self.window = window
+        self._local: Dict[int, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return read_engine is not engine
+
+    async def mark(self, user_id: int):
+        if not self.enabled:
+            return
+        self._local[user_id] = time.monotonic() + self.window
+        try:
+            await self.redis.set(f"db:pinned:{user_id}", 1, px=int(self.window * 1000))
+        except RedisError as e:
+            logger.warning(f"Failed to pin user {user_id} to primary: {e}")
+
+    async def is_pinned(self, user_id: int) -> bool:
+        if not self.enabled:
+            return False
+        until = self._local.get(user_id)
+        if until is not None:
+            if until > time.monotonic():
+                return True
+            del self._local[user_id]
+        try:
+            return bool(await self.redis.exists(f"db:pinned:{user_id}"))
+        except RedisError as e:
+            # Without Redis we cannot tell, so stay on the safe side
+            logger.warning(f"Failed to check primary pin for {user_id}: {e}")
+            return True
+
+
+read_your_writes = ReadYourWrites(client, settings.DB_STICKY_SECONDS)
+
+# Awaited with the user id after an authenticated request committed
+_write_listeners: List[Callable[[int], Awaitable[None]]] = [read_your_writes.mark]
 
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+def add_write_listener(listener: Callable[[int], Awaitable[None]]):
+    _write_listeners.append(listener)
+
+
+# The schema is managed by Alembic migrations in src/migrations, applied once
+# per deploy with `alembic upgrade head` rather than by every worker at boot
+Base = declarative_base()
 
 
 async def get_db():
     async with async_session() as db:
+        try:
+            yield db
+        except Exception as err:
+            await db.rollback()
+            logger.error(f"Database error: {str(err)}")
+            raise
+        finally:
+            # Set by Auth.get_current_user on authenticated requests
+            user_id = db.info.get("user_id")
+            if user_id is not None and db.info.get("committed"):
+                for listener in _write_listeners:
+                    await listener(user_id)
+            await db.close()
+
+
+async def get_replica_db():
+    """Session on the read replica (the primary when none is configured).
+
+    Use only for reads that tolerate replication lag; per-user reads that
+    must see the user's own writes go through `get_read_db` in auth.
+    """
+    async with read_session() as db:
         try:
             yield db
         except Exception as err:
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Index
+from sqlalchemy import SmallInteger, Computed, literal_column
 from sqlalchemy.orm import relationship
 
 from .connect import Base
@@ -6,7 +7,7 @@ from .connect import Base
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_verified = Column(Boolean, default=False)
@@ -16,12 +17,83 @@ class User(Base):
 
 class Contact(Base):
     __tablename__ = "contacts"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, index=True, nullable=False)
     phone_number = Column(String, nullable=False)
+    # Match keys maintained by Postgres: trimmed lowercase email, and the phone
+    # as bare digits with any "00" international prefix dropped (E.164 style)
+    email_normalized = Column(String, Computed("lower(btrim(email))", persisted=True))
+    phone_normalized = Column(
+        String,
+        Computed(
+            "regexp_replace(regexp_replace(phone_number, '[^0-9]', '', 'g'), "
+            "'^00', '')",
+            persisted=True,
+        ),
+    )
     birthday = Column(Date, nullable=False)
+    # month * 100 + day, maintained by Postgres for index-backed birthday lookups
+    birthday_key = Column(
+        SmallInteger,
+        Computed(
+            "(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday))"
+            "::smallint",
+            persisted=True,
+        ),
+    )
     additional_data = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="contacts")
+
+    __table_args__ = (
+        # Serves keyset pagination: WHERE user_id = ? AND (last_name, id) > (?, ?)
+        Index("ix_contacts_user_id_last_name_id", "user_id", "last_name", "id"),
+        Index("ix_contacts_user_id_birthday_key", "user_id", "birthday_key"),
+        # One contact per email address per user
+        Index(
+            "uq_contacts_user_id_email_normalized",
+            "user_id",
+            "email_normalized",
+            unique=True,
+        ),
+        Index("ix_contacts_user_id_phone_normalized", "user_id", "phone_normalized"),
+    )
+
+
+class ContactStat(Base):
+    """One per-user counter: contacts in total ("total", ""), by birth month
+    ("birth_month", "01".."12") and by email domain ("email_domain", domain).
+
+    Maintained by statement-level triggers on `contacts` (migration 0004) in
+    the transaction of every write; `src.services.contact_stats` rebuilds and
+    verifies them.
+    """
+
+    __tablename__ = "contact_stats"
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    dimension = Column(String, primary_key=True)
+    bucket = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+
+# Text matched by contact search. Queries must use this exact expression so
+# Postgres can serve them from the trigram index below (pg_trgm + btree_gin).
+contact_search_document = (
+    Contact.first_name
+    + literal_column("' '")
+    + Contact.last_name
+    + literal_column("' '")
+    + Contact.email
+)
+
+Index(
+    "ix_contacts_user_id_search_trgm",
+    Contact.user_id,
+    contact_search_document.label("search_document"),
+    postgresql_using="gin",
+    postgresql_ops={"search_document": "gin_trgm_ops"},
+)
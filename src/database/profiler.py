@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.services.base import settings
+from src.services.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("sql.slow")
+
+db_queries_per_request = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while serving one HTTP request",
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+db_time_per_request = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL while serving one request"
+)
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class TooManyQueries(RuntimeError):
+    """Raised in strict mode when a request exceeds its query budget"""
+
+
+class QueryStats:
+    """SQL statements issued on behalf of one request"""
+
+    def __init__(self, limit: int = 0):
+        self.limit = limit
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def most_repeated(self):
+        return self.statements.most_common(1)[0] if self.statements else ("", 0)
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def profile_queries(limit: int = 0):
+    """Collect QueryStats for the statements run inside the block"""
+    stats = QueryStats(limit)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryProfiler:
+    """Times every statement on an engine through cursor execute events.
+
+    Statements run while a request is being profiled are added to its
+    QueryStats. Statements slower than `slow_ms` are logged to `sql.slow`
+    together with their plan, which is fetched at most once per statement
+    every `explain_interval` seconds on a separate connection.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        slow_ms: float = 200,
+        explain: bool = True,
+        explain_interval: float = 300,
+    ):
+        self.engine = engine
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self._explained: Dict[str, float] = {}
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is not None and stats.limit and stats.count >= stats.limit:
+            statement_text, repeats = stats.most_repeated()
+            raise TooManyQueries(
+                f"Request exceeded {stats.limit} SQL queries; most repeated "
+                f"({repeats}x): {statement_text[:200]}"
+            )
+        context._profiler_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._profiler_started
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+            stats.statements[statement] += 1
+        if elapsed * 1000 >= self.slow_ms:
+            self._log_slow(statement, parameters, elapsed, executemany)
+
+    def _log_slow(self, statement, parameters, elapsed, executemany):
+        slow_query_logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms): {statement} {parameters!r}"
+        )
+        if not self.explain or executemany:
+            return
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return
+        now = time.monotonic()
+        if self._explained.get(statement, 0) > now:
+            return
+        self._explained[statement] = now + self.explain_interval
+        # Events fire on the event loop thread; EXPLAIN without ANALYZE
+        # does not execute the statement
+        asyncio.get_running_loop().create_task(self._explain(statement, parameters))
+
+    async def _explain(self, statement, parameters):
+        # The task inherited the request's context; keep EXPLAIN out of its stats
+        _current.set(None)
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+                plan = "\n".join(row[0] for row in result)
+            slow_query_logger.warning(f"Plan for slow query:\n{plan}")
+        except Exception as e:
+            logger.warning(f"EXPLAIN of slow query failed: {e}")
+
+
+class SQLProfilerMiddleware:
+    """Profiles SQL per request and reports it in a `Server-Timing` header.
+
+    With `max_queries` set (dev/test), a request issuing more statements than
+    that fails with TooManyQueries, which surfaces N+1 patterns such as lazy
+    relationship loads in a loop. Repeated statements above
+    `repeated_warning` are logged either way.
+    """
+
+    def __init__(self, app, max_queries: int = 0, repeated_warning: int = 10):
+        self.app = app
+        self.max_queries = max_queries
+        self.repeated_warning = repeated_warning
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries(self.max_queries) as stats:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", self._server_timing(stats)),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._record(scope, stats)
+
+    @staticmethod
+    def _server_timing(stats: QueryStats) -> bytes:
+        duration = stats.duration * 1000
+        return f'db;desc="{stats.count} queries";dur={duration:.2f}'.encode()
+
+    def _record(self, scope, stats: QueryStats):
+        db_queries_per_request.observe(stats.count)
+        db_time_per_request.observe(stats.duration)
+        statement, repeats = stats.most_repeated()
+        if repeats >= self.repeated_warning:
+            logger.warning(
+                f"{scope['method']} {scope['path']} ran the same query "
+                f"{repeats} times (possible N+1): {statement[:200]}"
+            )
+
+
+def install_profilers(*engines: AsyncEngine):
+    for engine in dict.fromkeys(engines):
+        QueryProfiler(
+            engine,
+            slow_ms=settings.SQL_SLOW_QUERY_MS,
+            explain=settings.SQL_EXPLAIN_SLOW_QUERIES,
+        )
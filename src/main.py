@@ -1,16 +1,47 @@
-from fastapi import FastAPI
+import os
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from fastapi_limiter import FastAPILimiter
 
-from src.database.connect import init_db, client
+from src.database.connect import client
+from src.database.profiler import SQLProfilerMiddleware
 from src.utils import compute_value
 from src.services.base import settings
+from src.services.concurrency import (
+    AIMDLimit,
+    ConcurrencyLimitMiddleware,
+    default_classes,
+)
+from src.services.get_upload import BodySizeLimitMiddleware, MULTIPART_OVERHEAD
+from src.services.metrics import CONTENT_TYPE, MetricsMiddleware, render
+from src.services.revocation import revocation_list
 from src.routers import contacts, users, utils
 
-import uvicorn
-
 app = FastAPI(title="Contacts API", description="Contacts management REST API")
 
+# Innermost, so shed requests still get CORS headers and show up in metrics
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    app.add_middleware(
+        ConcurrencyLimitMiddleware,
+        limit=AIMDLimit(
+            initial=settings.CONCURRENCY_LIMIT_INITIAL,
+            min_limit=settings.CONCURRENCY_LIMIT_MIN,
+            max_limit=settings.CONCURRENCY_LIMIT_MAX,
+            tolerance=settings.CONCURRENCY_LATENCY_TOLERANCE,
+        ),
+        classes=default_classes(
+            settings.CONCURRENCY_QUEUE_SIZE, settings.CONCURRENCY_QUEUE_TIMEOUT
+        ),
+    )
+
+# Outside the concurrency limit, so oversized uploads never take a slot
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={"/api/users/me/avatar": settings.AVATAR_MAX_BYTES + MULTIPART_OVERHEAD},
+)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -18,18 +49,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "Retry-After"],
 )
+app.add_middleware(
+    SQLProfilerMiddleware,
+    max_queries=settings.SQL_MAX_QUERIES_PER_REQUEST,
+    repeated_warning=settings.SQL_REPEATED_QUERY_WARNING,
+)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.on_event("startup")
 async def startup():
-    await init_db()
     await FastAPILimiter.init(client)
+    await revocation_list.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await revocation_list.stop()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render(), media_type=CONTENT_TYPE)
 
 
 @app.get("/compute/{value}")
 async def get_computed_value(value: int):
-    result = compute_value(value)
+    result = await compute_value(value)
     return {"result": result}
 
 
@@ -37,5 +85,15 @@ app.include_router(utils.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api/contacts")
 app.include_router(users.router)
 
+if settings.AVATAR_STORAGE == "local":
+    os.makedirs(settings.AVATAR_LOCAL_DIR, exist_ok=True)
+    app.mount(
+        settings.AVATAR_LOCAL_URL,
+        StaticFiles(directory=settings.AVATAR_LOCAL_DIR),
+        name="avatars",
+    )
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("src.main:app", debug=True, reload=True)
@@ -0,0 +1,54 @@
+"""Contact query indexes: keyset pagination, trigram search, birthdays
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:05:00
+
+Written with IF NOT EXISTS throughout, because databases bootstrapped by
+`create_all` may already have some of these objects.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Trigram operators, and btree_gin for the user_id column of the GIN index
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+
+    op.execute(
+        "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS birthday_key SMALLINT "
+        "GENERATED ALWAYS AS ("
+        "(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday))"
+        "::smallint) STORED"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_contacts_user_id_last_name_id "
+        "ON contacts (user_id, last_name, id)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_contacts_user_id_birthday_key "
+        "ON contacts (user_id, birthday_key)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_contacts_user_id_search_trgm "
+        "ON contacts USING gin "
+        "(user_id, (first_name || ' ' || last_name || ' ' || email) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_contacts_user_id_search_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_contacts_user_id_birthday_key")
+    op.execute("DROP INDEX IF EXISTS ix_contacts_user_id_last_name_id")
+    op.execute("ALTER TABLE contacts DROP COLUMN IF EXISTS birthday_key")
@@ -0,0 +1,97 @@
+"""Normalized contact email/phone and one contact per email per user
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 19:00:00
+
+Existing duplicates by normalized email are merged before the unique index
+is built: the oldest contact of each group is kept and collects the distinct
+notes of the others.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MERGE_EMAIL_DUPLICATES = """
+WITH groups AS (
+    SELECT user_id, email_normalized AS key, min(id) AS keep_id
+    FROM contacts
+    GROUP BY user_id, email_normalized
+    HAVING count(*) > 1
+),
+pairs AS (
+    SELECT c.id AS drop_id, g.keep_id
+    FROM contacts c
+    JOIN groups g ON c.user_id = g.user_id AND c.email_normalized = g.key
+    WHERE c.id <> g.keep_id
+),
+notes AS (
+    SELECT members.keep_id, string_agg(DISTINCT c.additional_data, '; ') AS merged
+    FROM (
+        SELECT keep_id, drop_id AS id FROM pairs
+        UNION ALL
+        SELECT DISTINCT keep_id, keep_id FROM pairs
+    ) members
+    JOIN contacts c ON c.id = members.id
+    GROUP BY members.keep_id
+),
+updated AS (
+    UPDATE contacts k SET additional_data = notes.merged
+    FROM notes
+    WHERE k.id = notes.keep_id AND k.additional_data IS DISTINCT FROM notes.merged
+    RETURNING k.id
+)
+DELETE FROM contacts c USING pairs p WHERE c.id = p.drop_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "contacts",
+        sa.Column(
+            "email_normalized",
+            sa.String(),
+            sa.Computed("lower(btrim(email))", persisted=True),
+        ),
+    )
+    op.add_column(
+        "contacts",
+        sa.Column(
+            "phone_normalized",
+            sa.String(),
+            sa.Computed(
+                "regexp_replace(regexp_replace(phone_number, '[^0-9]', '', 'g'), "
+                "'^00', '')",
+                persisted=True,
+            ),
+        ),
+    )
+    op.execute(MERGE_EMAIL_DUPLICATES)
+    op.create_index(
+        "uq_contacts_user_id_email_normalized",
+        "contacts",
+        ["user_id", "email_normalized"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_contacts_user_id_phone_normalized",
+        "contacts",
+        ["user_id", "phone_normalized"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_contacts_user_id_phone_normalized", table_name="contacts")
+    op.drop_index("uq_contacts_user_id_email_normalized", table_name="contacts")
+    op.drop_column("contacts", "phone_normalized")
+    op.drop_column("contacts", "email_normalized")
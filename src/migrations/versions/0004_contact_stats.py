@@ -0,0 +1,109 @@
+"""Per-user contact counters maintained by triggers
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 21:00:00
+
+Statement-level triggers read the rows each INSERT, UPDATE, DELETE or COPY
+changed from its transition tables and apply the net deltas with one upsert,
+in the same transaction. The table is backfilled from `contacts`.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Upsert of the per-bucket deltas of `changes` (user_id, birthday,
+# email_normalized, delta). Rows are locked in key order to avoid deadlocks
+# between concurrent statements of one user.
+APPLY_DELTAS = """
+        INSERT INTO contact_stats AS s (user_id, dimension, bucket, count)
+        SELECT c.user_id, d.dimension, d.bucket, sum(c.delta)
+        FROM ({changes}) c
+        CROSS JOIN LATERAL (VALUES
+            ('total', ''),
+            ('birth_month', to_char(c.birthday, 'MM')),
+            ('email_domain', split_part(c.email_normalized, '@', 2))
+        ) d (dimension, bucket)
+        GROUP BY 1, 2, 3
+        HAVING sum(c.delta) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (user_id, dimension, bucket)
+        DO UPDATE SET count = s.count + EXCLUDED.count;
+"""
+INSERTED = "SELECT user_id, birthday, email_normalized, 1 AS delta FROM new_rows"
+DELETED = "SELECT user_id, birthday, email_normalized, -1 AS delta FROM old_rows"
+
+MAINTAIN_FUNCTION = f"""
+CREATE FUNCTION contact_stats_maintain() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+{APPLY_DELTAS.format(changes=INSERTED)}
+    ELSIF TG_OP = 'DELETE' THEN
+{APPLY_DELTAS.format(changes=DELETED)}
+    ELSE
+{APPLY_DELTAS.format(changes=f"{INSERTED} UNION ALL {DELETED}")}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TRIGGERS = {
+    "contact_stats_insert": "AFTER INSERT ON contacts REFERENCING NEW TABLE AS new_rows",
+    "contact_stats_update": (
+        "AFTER UPDATE ON contacts "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows"
+    ),
+    "contact_stats_delete": "AFTER DELETE ON contacts REFERENCING OLD TABLE AS old_rows",
+}
+
+BACKFILL = """
+INSERT INTO contact_stats (user_id, dimension, bucket, count)
+SELECT c.user_id, d.dimension, d.bucket, count(*)
+FROM contacts c
+CROSS JOIN LATERAL (VALUES
+    ('total', ''),
+    ('birth_month', to_char(c.birthday, 'MM')),
+    ('email_domain', split_part(c.email_normalized, '@', 2))
+) d (dimension, bucket)
+GROUP BY 1, 2, 3
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "contact_stats",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("dimension", sa.String(), nullable=False),
+        sa.Column("bucket", sa.String(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "dimension", "bucket"),
+    )
+    op.execute(MAINTAIN_FUNCTION)
+    # Creating the triggers blocks writes to contacts until this migration
+    # commits, so the backfill cannot miss or double count a change
+    for name, timing in TRIGGERS.items():
+        op.execute(
+            f"CREATE TRIGGER {name} {timing} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION contact_stats_maintain()"
+        )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name} ON contacts")
+    op.execute("DROP FUNCTION contact_stats_maintain()")
+    op.drop_table("contact_stats")
@@ -0,0 +1,31 @@
+"""Drop indexes duplicating the users and contacts primary keys
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 23:00:00
+
+`ix_users_id` and `ix_contacts_id` index the same column as the primary key
+constraints, so lookups by id never need them but every write maintains them.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index("ix_contacts_id", table_name="contacts")
+    op.drop_index("ix_users_id", table_name="users")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_users_id", "users", ["id"], unique=False)
+    op.create_index("ix_contacts_id", "contacts", ["id"], unique=False)
@@ -1,25 +1,144 @@
-from fastapi import HTTPException
+import base64
+import calendar
+import binascii
+import json
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, extract, func
+from sqlalchemy import select, insert, update, delete, or_, func, tuple_, text, true
+from sqlalchemy import Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from datetime import date, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+from src.database.models import Contact, ContactStat, User, contact_search_document
+from src.schemas.schemas import (
+    ContactCreate,
+    ContactUpdate,
+    ContactFilter,
+    ContactResponse,
+)
+
+MAX_BIRTHDAY_WINDOW = 366
+
+# The ContactResponse fields in schema order. List reads select just these as
+# plain rows, skipping ORM object construction and identity map bookkeeping.
+CONTACT_COLUMNS = tuple(getattr(Contact, name) for name in ContactResponse.model_fields)
+CONTACT_FIELDS = tuple(column.key for column in CONTACT_COLUMNS)
 
-from src.database.models import Contact, User
-from src.schemas.schemas import ContactCreate, ContactUpdate
+UNIQUE_EMAIL_INDEX = "uq_contacts_user_id_email_normalized"
+
+
+async def _execute_write(db: AsyncSession, stmt):
+    """Execute a write, turning a duplicate email into 409 Conflict"""
+    try:
+        return await db.execute(stmt)
+    except IntegrityError as e:
+        await db.rollback()
+        if UNIQUE_EMAIL_INDEX in str(e.orig):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A contact with this email already exists",
+            )
+        raise
 
 
 async def create_contact(db: AsyncSession, contact: ContactCreate, user: User):
-    db_contact = Contact(**contact.model_dump(), user_id=user.id)
-    db.add(db_contact)
+    result = await _execute_write(
+        db,
+        insert(Contact)
+        .values(**contact.model_dump(), user_id=user.id)
+        .returning(Contact),
+    )
+    db_contact = result.scalar_one()
     await db.commit()
-    await db.refresh(db_contact)
     return db_contact
 
 
-async def get_contacts(db: AsyncSession, user: User, skip: int = 0, limit: int = 10):
+def encode_cursor(contact) -> str:
+    """Opaque keyset cursor pointing just past `contact` in (last_name, id) order"""
+    raw = json.dumps([contact.last_name, contact.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_name, contact_id = json.loads(raw)
+        return str(last_name), int(contact_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def bulk_create_contacts(db: AsyncSession, contacts: List[dict], user: User):
+    """Insert already validated contacts with batched multi-row INSERTs.
+
+    Contacts whose email the user already has are skipped; returns how many
+    were inserted.
+    """
+    if not contacts:
+        return 0
     result = await db.execute(
-        select(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit)
+        pg_insert(Contact)
+        .on_conflict_do_nothing(index_elements=["user_id", "email_normalized"])
+        .returning(Contact.id),
+        [dict(contact, user_id=user.id) for contact in contacts],
     )
-    return result.scalars().all()
+    inserted = len(result.all())
+    await db.commit()
+    return inserted
+
+
+async def get_contacts(
+    db: AsyncSession,
+    user: User,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+):
+    stmt = (
+        select(*CONTACT_COLUMNS)
+        .filter(Contact.user_id == user.id)
+        .order_by(Contact.last_name, Contact.id)
+        .limit(limit)
+    )
+    if cursor:
+        # Keyset mode: seek past the last row of the previous page via the
+        # (user_id, last_name, id) index instead of scanning skipped rows.
+        last_name, contact_id = decode_cursor(cursor)
+        stmt = stmt.filter(
+            tuple_(Contact.last_name, Contact.id) > tuple_(last_name, contact_id)
+        )
+    else:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt)
+    return result.all()
+
+
+EXPORT_COLUMNS = (
+    Contact.id,
+    Contact.first_name,
+    Contact.last_name,
+    Contact.email,
+    Contact.phone_number,
+    Contact.birthday,
+    Contact.additional_data,
+)
+
+
+async def stream_contacts(
+    db: AsyncSession, user: User, fetch_size: int = 1000
+) -> AsyncIterator:
+    """Yield all of the user's contacts as rows through a server-side cursor"""
+    result = await db.stream(
+        select(*EXPORT_COLUMNS)
+        .filter(Contact.user_id == user.id)
+        .order_by(Contact.id)
+        .execution_options(yield_per=fetch_size)
+    )
+    async for row in result:
+        yield row
 
 
 async def get_contact(db: AsyncSession, contact_id: int, user: User):
@@ -32,75 +151,453 @@ async def get_contact(db: AsyncSession, contact_id: int, user: User):
 async def update_contact(
     db: AsyncSession, contact_id: int, contact: ContactUpdate, user: User
 ):
-    result = await db.execute(
-        select(Contact).filter(Contact.id == contact_id, Contact.user_id == user.id)
+    values = contact.model_dump(exclude_unset=True)
+    if not values:
+        return await get_contact(db, contact_id, user)
+    result = await _execute_write(
+        db,
+        update(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user.id)
+        .values(**values)
+        .returning(Contact),
     )
     db_contact = result.scalars().first()
-    if db_contact:
-        for key, value in contact.model_dump(exclude_unset=True).items():
-            setattr(db_contact, key, value)
-        await db.commit()
-        await db.refresh(db_contact)
-        return db_contact
-    return None
+    await db.commit()
+    return db_contact
 
 
 async def delete_contact(db: AsyncSession, contact_id: int, user: User):
     result = await db.execute(
-        select(Contact).filter(Contact.id == contact_id, Contact.user_id == user.id)
+        delete(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user.id)
+        .returning(Contact)
     )
     db_contact = result.scalars().first()
-    if db_contact:
-        await db.delete(db_contact)
-        await db.commit()
+    await db.commit()
     return db_contact
 
 
-async def search_contacts(db: AsyncSession, query: str, user: User):
+def _bulk_criteria(
+    user: User, ids: Optional[List[int]], contact_filter: Optional[ContactFilter]
+) -> list:
+    criteria = [Contact.user_id == user.id]
+    if ids:
+        # One array parameter instead of an IN list of thousands of binds
+        criteria.append(Contact.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+    if contact_filter:
+        fields = contact_filter.model_dump(exclude_none=True)
+        query = fields.pop("query", None)
+        email = fields.pop("email", None)
+        criteria.extend(getattr(Contact, key) == value for key, value in fields.items())
+        if email is not None:
+            # Matched like the unique index, on the trimmed lowercase address
+            criteria.append(Contact.email_normalized == email.strip().lower())
+        if query:
+            criteria.append(contact_search_document.icontains(query, autoescape=True))
+    return criteria
+
+
+async def bulk_update_contacts(
+    db: AsyncSession,
+    user: User,
+    values: dict,
+    ids: Optional[List[int]] = None,
+    contact_filter: Optional[ContactFilter] = None,
+) -> List[int]:
+    """Apply `values` to every selected contact in one UPDATE; returns their ids"""
+    result = await _execute_write(
+        db,
+        update(Contact)
+        .where(*_bulk_criteria(user, ids, contact_filter))
+        .values(**values)
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False),
+    )
+    updated_ids = list(result.scalars())
+    await db.commit()
+    return updated_ids
+
+
+async def bulk_delete_contacts(
+    db: AsyncSession,
+    user: User,
+    ids: Optional[List[int]] = None,
+    contact_filter: Optional[ContactFilter] = None,
+) -> List[int]:
     result = await db.execute(
-        select(Contact).filter(
-            Contact.user_id == user.id,
-            or_(
-                Contact.first_name.ilike(f"%{query}%"),
-                Contact.last_name.ilike(f"%{query}%"),
-                Contact.email.ilike(f"%{query}%"),
+        delete(Contact)
+        .where(*_bulk_criteria(user, ids, contact_filter))
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_ids = list(result.scalars())
+    await db.commit()
+    return deleted_ids
+
+
+# Contacts are duplicates when they belong to the same user and share the key,
+# as (match column, key expression). A shared phone alone is not enough, since
+# family members often do: the name must match as well.
+DEDUPE_KEYS = {
+    "email": ("email_normalized", "email_normalized"),
+    "phone": (
+        "phone_normalized",
+        "(phone_normalized, lower(btrim(first_name)), lower(btrim(last_name)))",
+    ),
+}
+
+# Selects the contacts with a non-empty match column and their key
+DEDUPE_KEYED_SQL = """
+keyed AS (
+    SELECT id, user_id, {key} AS key
+    FROM contacts
+    WHERE {match} <> '' {user_filter}
+),
+groups AS (
+    SELECT user_id, key, min(id) AS keep_id
+    FROM keyed
+    GROUP BY user_id, key
+    HAVING count(*) > 1
+)
+"""
+
+# One statement, so the merge is atomic. Groups come from a single hash
+# aggregate over the key; the oldest contact of each group survives and the
+# others are deleted. The survivor collects the distinct notes of the group,
+# plus every email, phone, name or birthday of a deleted contact that differs
+# from its own, so no detail is lost.
+MERGE_DUPLICATES_SQL = f"""
+WITH {DEDUPE_KEYED_SQL},
+pairs AS (
+    SELECT k.id AS drop_id, g.keep_id, g.user_id
+    FROM keyed k
+    JOIN groups g ON k.user_id = g.user_id AND k.key = g.key
+    WHERE k.id <> g.keep_id
+),
+notes AS (
+    SELECT parts.keep_id, string_agg(DISTINCT parts.note, '; ') AS merged
+    FROM (
+        SELECT members.keep_id, c.additional_data AS note
+        FROM (
+            SELECT keep_id, drop_id AS id FROM pairs
+            UNION ALL
+            SELECT DISTINCT keep_id, keep_id FROM pairs
+        ) members
+        JOIN contacts c ON c.id = members.id
+        UNION ALL
+        SELECT p.keep_id, unnest(ARRAY[
+            CASE WHEN d.email_normalized <> k.email_normalized
+                THEN 'email: ' || d.email END,
+            CASE WHEN d.phone_normalized <> k.phone_normalized
+                THEN 'phone: ' || d.phone_number END,
+            CASE WHEN (d.first_name, d.last_name) <> (k.first_name, k.last_name)
+                THEN 'name: ' || d.first_name || ' ' || d.last_name END,
+            CASE WHEN d.birthday <> k.birthday
+                THEN 'birthday: ' || d.birthday END
+        ])
+        FROM pairs p
+        JOIN contacts d ON d.id = p.drop_id
+        JOIN contacts k ON k.id = p.keep_id
+    ) parts
+    GROUP BY parts.keep_id
+),
+updated AS (
+    UPDATE contacts k SET additional_data = notes.merged
+    FROM notes
+    WHERE k.id = notes.keep_id AND k.additional_data IS DISTINCT FROM notes.merged
+    RETURNING k.id
+),
+deleted AS (
+    DELETE FROM contacts c USING pairs p
+    WHERE c.id = p.drop_id
+    RETURNING p.user_id, p.keep_id
+)
+SELECT user_id, count(DISTINCT keep_id) AS groups, count(*) AS merged
+FROM deleted
+GROUP BY user_id
+"""
+
+COUNT_DUPLICATES_SQL = f"""
+WITH {DEDUPE_KEYED_SQL}
+SELECT user_id, count(*) AS groups, sum(size - 1)::bigint AS merged
+FROM (
+    SELECT g.user_id, count(*) AS size
+    FROM groups g
+    JOIN keyed k ON k.user_id = g.user_id AND k.key = g.key
+    GROUP BY g.user_id, g.key
+) sizes
+GROUP BY user_id
+"""
+
+
+async def merge_duplicate_contacts(
+    db: AsyncSession,
+    by: str = "email",
+    user: Optional[User] = None,
+    dry_run: bool = False,
+) -> List[Tuple[int, int, int]]:
+    """Merge duplicate contacts of one user, or of everyone without `user`.
+
+    Returns (user_id, groups, merged contacts) per affected user. With
+    `dry_run` the duplicates are only counted.
+    """
+    sql = COUNT_DUPLICATES_SQL if dry_run else MERGE_DUPLICATES_SQL
+    match, key = DEDUPE_KEYS[by]
+    stmt = text(
+        sql.format(
+            match=match,
+            key=key,
+            user_filter="AND user_id = :user_id" if user else "",
+        )
+    )
+    result = await db.execute(stmt, {"user_id": user.id} if user else {})
+    affected = [tuple(row) for row in result.all()]
+    if not dry_run:
+        await db.commit()
+    return affected
+
+
+# The counters a contact adds to, as (dimension, bucket) rows. Must match the
+# trigger function that maintains them (migration 0004).
+STATS_BUCKETS = """
+CROSS JOIN LATERAL (VALUES
+    ('total', ''),
+    ('birth_month', to_char(c.birthday, 'MM')),
+    ('email_domain', split_part(c.email_normalized, '@', 2))
+) d (dimension, bucket)
+"""
+
+ACTUAL_STATS_SQL = f"""
+SELECT c.user_id, d.dimension, d.bucket, count(*) AS count
+FROM contacts c
+{STATS_BUCKETS}
+{{where}}
+GROUP BY 1, 2, 3
+"""
+
+STATS_DRIFT_SQL = """
+SELECT
+    coalesce(s.user_id, a.user_id) AS user_id,
+    coalesce(s.dimension, a.dimension) AS dimension,
+    coalesce(s.bucket, a.bucket) AS bucket,
+    coalesce(s.count, 0) AS stored,
+    coalesce(a.count, 0) AS actual
+FROM (SELECT * FROM contact_stats WHERE count <> 0 {user_filter}) s
+FULL JOIN ({actual}) a
+    ON s.user_id = a.user_id AND s.dimension = a.dimension AND s.bucket = a.bucket
+WHERE s.count IS DISTINCT FROM a.count
+ORDER BY 1, 2, 3
+"""
+
+
+async def get_contact_stats(db: AsyncSession, user: User, domains: int = 10) -> dict:
+    """The user's contact counters: one primary key range read, no aggregation"""
+    result = await db.execute(
+        select(ContactStat.dimension, ContactStat.bucket, ContactStat.count).filter(
+            ContactStat.user_id == user.id, ContactStat.count > 0
+        )
+    )
+    total, months, by_domain = 0, [0] * 12, []
+    for dimension, bucket, count in result.all():
+        if dimension == "total":
+            total = count
+        elif dimension == "birth_month":
+            months[int(bucket) - 1] = count
+        else:
+            by_domain.append({"domain": bucket, "count": count})
+    by_domain.sort(key=lambda item: (-item["count"], item["domain"]))
+    return {
+        "total": total,
+        "birthdays_by_month": months,
+        "email_domains": by_domain[:domains],
+    }
+
+
+async def rebuild_contact_stats(db: AsyncSession, user: Optional[User] = None) -> int:
+    """Recompute the counters of one user, or everyone, from `contacts`.
+
+    Writes to contacts wait until the rebuild commits, so none is lost
+    between the recount and the swap. Returns the number of counters.
+    """
+    params = {"user_id": user.id} if user else {}
+    await db.execute(text("LOCK TABLE contacts IN SHARE MODE"))
+    await db.execute(
+        text(
+            "DELETE FROM contact_stats" + (" WHERE user_id = :user_id" if user else "")
+        ),
+        params,
+    )
+    result = await db.execute(
+        text(
+            "INSERT INTO contact_stats (user_id, dimension, bucket, count) "
+            + ACTUAL_STATS_SQL.format(
+                where="WHERE c.user_id = :user_id" if user else ""
+            )
+        ),
+        params,
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def verify_contact_stats(
+    db: AsyncSession, user: Optional[User] = None
+) -> List[Tuple[int, str, str, int, int]]:
+    """Counters that disagree with a recount, as (user_id, dimension, bucket,
+    stored, actual). Both sides are read from one snapshot."""
+    stmt = text(
+        STATS_DRIFT_SQL.format(
+            user_filter="AND user_id = :user_id" if user else "",
+            actual=ACTUAL_STATS_SQL.format(
+                where="WHERE c.user_id = :user_id" if user else ""
             ),
         )
     )
-    return result.scalars().all()
+    result = await db.execute(stmt, {"user_id": user.id} if user else {})
+    return [tuple(row) for row in result.all()]
+
+
+async def search_contacts(
+    db: AsyncSession,
+    query: str,
+    user: User,
+    skip: int = 0,
+    limit: int = 10,
+    fuzzy: bool = False,
+):
+    """Ranked contact search backed by the trigram index on the search document.
+
+    Default mode matches the query as a substring of first/last name or email;
+    `fuzzy` matches by trigram word similarity instead, tolerating typos.
+    """
+    if fuzzy:
+        match = contact_search_document.op("%>")(query)
+    else:
+        match = contact_search_document.icontains(query, autoescape=True)
+    rank = func.word_similarity(query, contact_search_document)
+    result = await db.execute(
+        select(*CONTACT_COLUMNS)
+        .filter(Contact.user_id == user.id, match)
+        .order_by(rank.desc(), Contact.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.all()
+
+
+def birthday_key(day: date) -> int:
+    """Same ordinal as the `Contact.birthday_key` column: month * 100 + day"""
+    return day.month * 100 + day.day
+
+
+def next_birthday(birthday: date, start: date) -> date:
+    for year in (start.year, start.year + 1):
+        try:
+            occurrence = birthday.replace(year=year)
+        except ValueError:
+            # Feb 29 birthdays are celebrated on Mar 1 in common years
+            occurrence = date(year, 3, 1)
+        if occurrence >= start:
+            return occurrence
+
+
+def birthday_window(start: date, days: int):
+    """Filter and ordering of contacts with a birthday in [start, start + days]"""
+    end = start + timedelta(days=days)
+    start_key, end_key = birthday_key(start), birthday_key(end)
+    if start_key == 301 and not calendar.isleap(start.year):
+        # Feb 29 birthdays fall on Mar 1 in common years, as in next_birthday
+        start_key = 229
+    if days < 365 and end_key >= start_key:
+        window = Contact.birthday_key.between(start_key, end_key)
+        return window, (Contact.birthday_key, Contact.id)
+    # The window wraps past Dec 31: take the tail of this year plus the
+    # head of the next, listing this year's birthdays first. A window of a
+    # year or more holds every birthday.
+    if days >= 365:
+        window = true()
+    else:
+        window = or_(Contact.birthday_key >= start_key, Contact.birthday_key <= end_key)
+    return window, (Contact.birthday_key < start_key, Contact.birthday_key, Contact.id)
+
+
+async def stream_upcoming_birthdays(
+    db: AsyncSession,
+    start: date,
+    days: int,
+    after_user_id: int = 0,
+    fetch_size: int = 1000,
+) -> AsyncIterator:
+    """Upcoming birthdays of all verified users in one query.
+
+    Rows carry `user_id` and `user_email` next to the contact and arrive in
+    user id order, so callers can group them per user while streaming and
+    resume after `after_user_id`.
+    """
+    window, order = birthday_window(start, days)
+    result = await db.stream(
+        select(
+            User.id.label("user_id"),
+            User.email.label("user_email"),
+            Contact.id,
+            Contact.first_name,
+            Contact.last_name,
+            Contact.birthday,
+        )
+        .join(Contact, Contact.user_id == User.id)
+        .filter(User.is_verified.is_(True), User.id > after_user_id, window)
+        .order_by(User.id, *order)
+        .execution_options(yield_per=fetch_size)
+    )
+    async for row in result:
+        yield row
 
 
 async def get_upcoming_birthdays(
-    db: AsyncSession, user: User, days: int = 7, start_date: date = None
+    db: AsyncSession,
+    user: User,
+    days: int = 7,
+    start_date: date = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
 ):
     if days < 1:
         raise HTTPException(status_code=400, detail="Days must be positive")
+    if days > MAX_BIRTHDAY_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Days must not exceed {MAX_BIRTHDAY_WINDOW}",
+        )
     start = start_date or date.today()
-    end = start + timedelta(days=days)
-    result = await db.execute(
+    window, order = birthday_window(start, days)
+
+    stmt = (
         select(
             Contact.id,
             Contact.first_name,
             Contact.last_name,
-            func.to_char(Contact.birthday, "MON-DD").label("birthday_formatted"),
-        ).filter(
-            Contact.user_id == user.id,
-            or_(
-                (extract("month", Contact.birthday) == extract("month", start))
-                & (
-                    extract("day", Contact.birthday).between(
-                        extract("day", start), extract("day", end)
-                    )
-                ),
-                (extract("month", Contact.birthday) == extract("month", end))
-                & (extract("day", Contact.birthday) <= extract("day", end)),
-            ),
+            Contact.birthday,
         )
+        .filter(Contact.user_id == user.id, window)
+        .order_by(*order)
+        .offset(skip)
     )
-    contacts = result.all()
-    return [
-        {
-            "message": f"{contact.first_name} {contact.last_name}'s birthday is on {contact.birthday_formatted} (ID: {contact.id})"
-        }
-        for contact in contacts
-    ]
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+
+    birthdays = []
+    for contact in result.all():
+        upcoming = next_birthday(contact.birthday, start)
+        birthdays.append(
+            {
+                "message": f"{contact.first_name} {contact.last_name}'s birthday is on {contact.birthday.strftime('%b-%d').upper()} (ID: {contact.id})",
+                "id": contact.id,
+                "first_name": contact.first_name,
+                "last_name": contact.last_name,
+                "birthday": contact.birthday,
+                "next_birthday": upcoming,
+                "days_until": (upcoming - start).days,
+            }
+        )
+    return birthdays
@@ -1,7 +1,8 @@
 import logging
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
 from fastapi import HTTPException, status, Depends
 from typing import Optional, Union
 from libgravatar import Gravatar
@@ -19,13 +20,8 @@ async def create_user(
     body: UserCreate,
     db: AsyncSession = Depends(get_db),
 ) -> User:
-    existing_user = await get_user_by_email(body.email, db)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT, detail="Email already registered"
-        )
-
-    hashed_password = auth_service.get_password_hash(body.password)
+    # Hash before touching the DB so no pooled connection is held meanwhile
+    hashed_password = await auth_service.get_password_hash(body.password)
 
     # Get avatar link from Gravatar
     try:
@@ -35,12 +31,20 @@ async def create_user(
         logger.warning(f"Failed to get Gravatar for {body.email}: {e}")
         avatar = None
 
-    new_user = User(
-        email=body.email, hashed_password=hashed_password, avatar_url=avatar
+    # The unique email index arbitrates concurrent registrations atomically
+    result = await db.execute(
+        insert(User)
+        .values(email=body.email, hashed_password=hashed_password, avatar_url=avatar)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
     )
-    db.add(new_user)
+    new_user = result.scalars().first()
+    if new_user is None:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Email already registered"
+        )
     await db.commit()
-    await db.refresh(new_user)
 
     return new_user
 
@@ -70,23 +74,17 @@ async def get_user_by_email(
 async def confirm_email(
     email: str,
     db: AsyncSession = Depends(get_db),
-):
-    user = await get_user_by_email(email, db)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-    if user.is_verified:
-        logger.info(f"Email {email} is already verified")
-        return
-    user.is_verified = True
+) -> bool:
+    """Mark the email verified; False if it already was"""
     try:
-        db.add(user)
-        await db.commit()
-        await db.refresh(user)
-        logger.info(
-            f"Email {email} verified successfully, is_verified={user.is_verified}"
+        result = await db.execute(
+            update(User)
+            .where(User.email == email, User.is_verified.isnot(True))
+            .values(is_verified=True)
+            .returning(User.id)
         )
+        verified_id = result.scalar_one_or_none()
+        await db.commit()
     except Exception as e:
         await db.rollback()
         logger.error(f"Failed to verify email {email}: {str(e)}")
@@ -94,3 +92,32 @@ async def confirm_email(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to verify email: {str(e)}",
         )
+
+    if verified_id is None:
+        # Nothing was updated: tell an unknown email from a verified one
+        if not await get_user_by_email(email, db):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+        logger.info(f"Email {email} is already verified")
+        return False
+    await auth_service.invalidate_user(email)
+    logger.info(f"Email {email} verified successfully")
+    return True
+
+
+async def update_avatar_url(
+    email: str,
+    avatar_url: str,
+    db: AsyncSession = Depends(get_db),
+) -> Optional[User]:
+    result = await db.execute(
+        update(User)
+        .where(User.email == email)
+        .values(avatar_url=avatar_url)
+        .returning(User)
+    )
+    user = result.scalars().first()
+    await db.commit()
+    await auth_service.invalidate_user(email)
+    return user
@@ -1,4 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from datetime import date
@@ -9,6 +20,12 @@ from src.schemas.schemas import (
     ContactResponse,
     ContactUpdate,
     BirthdayResponse,
+    ImportSummary,
+    ContactBulkSelection,
+    ContactBulkUpdate,
+    BulkOperationResponse,
+    DedupeResponse,
+    ContactStatsResponse,
 )
 from src.repository.contacts import (
     create_contact,
@@ -18,15 +35,38 @@ from src.repository.contacts import (
     delete_contact,
     search_contacts,
     get_upcoming_birthdays,
+    encode_cursor,
+    bulk_update_contacts,
+    CONTACT_FIELDS,
+    bulk_delete_contacts,
+    merge_duplicate_contacts,
+    get_contact_stats,
 )
 from src.database.models import User
-from src.services.auth import auth_service
+from src.services.auth import auth_service, get_read_db
+from src.services.response_cache import response_cache
+from src.services.serialization import (
+    dump,
+    rows_serializer,
+    validating_serializer,
+)
+from src.services.contacts_io import (
+    MEDIA_TYPES,
+    detect_format,
+    export_contacts,
+    import_contacts,
+)
 
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
+# List reads return trusted rows, so they skip per-item model validation;
+# `response_model` on those routes only documents the shape
+serialize_contact = validating_serializer(TypeAdapter(ContactResponse))
+serialize_contact_rows = rows_serializer(CONTACT_FIELDS)
+
 
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
 async def create_new_contact(
@@ -36,21 +76,87 @@ async def create_new_contact(
 ):
     try:
         return await create_contact(db, contact, current_user)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
+@router.post("/import", response_model=ImportSummary)
+async def import_contacts_file(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """Bulk import contacts from a CSV (with a header row) or NDJSON upload.
+
+    Invalid rows are skipped and reported by row number; valid rows are
+    inserted in batches.
+    """
+    fmt = detect_format(file, file_format)
+    try:
+        return await import_contacts(db, file, fmt, current_user)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error importing contacts: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error",
+        )
+
+
+@router.get("/export")
+async def export_contacts_file(
+    file_format: str = Query("ndjson", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """Stream every contact of the user as NDJSON or CSV, optionally gzipped"""
+    headers = {"Content-Disposition": f'attachment; filename="contacts.{file_format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_contacts(current_user, file_format, gzip),
+        media_type=MEDIA_TYPES[file_format],
+        headers=headers,
+    )
+
+
 @router.get("/", response_model=List[ContactResponse])
 async def read_contacts(
+    request: Request,
     skip: int = 0,
     limit: int = 10,
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
+    """Contacts ordered by (last_name, id).
+
+    A full page carries an `X-Next-Cursor` header; pass it back as `cursor`
+    to fetch the next page at constant cost. `skip` is kept for
+    compatibility and ignored when `cursor` is given.
+    """
+
+    def next_cursor_header(contacts) -> dict:
+        if contacts and len(contacts) == limit:
+            return {"X-Next-Cursor": encode_cursor(contacts[-1])}
+        return {}
+
     try:
-        return await get_contacts(db, current_user, skip, limit)
+        return await response_cache.respond(
+            request,
+            current_user.id,
+            lambda: get_contacts(db, current_user, skip, limit, cursor),
+            serialize_contact_rows,
+            headers=next_cursor_header,
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -59,17 +165,23 @@ async def read_contacts(
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def read_contact(
+    request: Request,
     contact_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
-    try:
+    async def fetch_contact():
         contact = await get_contact(db, contact_id, current_user)
         if not contact:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
             )
         return contact
+
+    try:
+        return await response_cache.respond(
+            request, current_user.id, fetch_contact, serialize_contact
+        )
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -82,12 +194,16 @@ async def read_contact(
 
 @router.get("/search/", response_model=List[ContactResponse])
 async def search_contacts_by_query(
-    query: str,
-    db: AsyncSession = Depends(get_db),
+    query: str = Query(..., min_length=1),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    fuzzy: bool = False,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     try:
-        return await search_contacts(db, query, current_user)
+        rows = await search_contacts(db, query, current_user, skip, limit, fuzzy)
+        return Response(serialize_contact_rows(rows), media_type="application/json")
     except Exception as e:
         logger.error(f"Error searching contacts: {str(e)}")
         raise HTTPException(
@@ -125,15 +241,91 @@ async def delete_existing_contact(
     return None
 
 
+@router.patch("/bulk", response_model=BulkOperationResponse)
+async def bulk_update_existing_contacts(
+    body: ContactBulkUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    values = body.update.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update"
+        )
+    ids = await bulk_update_contacts(db, current_user, values, body.ids, body.filter)
+    return {"affected": len(ids), "ids": ids}
+
+
+@router.post("/bulk/delete", response_model=BulkOperationResponse)
+async def bulk_delete_existing_contacts(
+    body: ContactBulkSelection,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    ids = await bulk_delete_contacts(db, current_user, body.ids, body.filter)
+    return {"affected": len(ids), "ids": ids}
+
+
+@router.post("/dedupe", response_model=DedupeResponse)
+async def dedupe_contacts(
+    by: str = Query("email", pattern="^(email|phone)$"),
+    dry_run: bool = True,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """Merge contacts that share a normalized email, or phone and name.
+
+    The oldest contact of each group is kept and gains the distinct notes of
+    the others, which are deleted, plus any email, phone, name or birthday of
+    theirs that differs from its own. By default the duplicates are only
+    counted; pass `dry_run=false` to merge them.
+    """
+    affected = await merge_duplicate_contacts(db, by, current_user, dry_run)
+    return {
+        "by": by,
+        "dry_run": dry_run,
+        "groups": sum(groups for _, groups, _ in affected),
+        "merged": sum(merged for _, _, merged in affected),
+    }
+
+
+@router.get("/stats/", response_model=ContactStatsResponse)
+async def get_contact_statistics(
+    domains: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """Contact count, birthdays per month and the top `domains` email domains.
+
+    Read from counters kept current by every write, so the cost does not
+    grow with the number of contacts.
+    """
+    return await get_contact_stats(db, current_user, domains)
+
+
 @router.get("/birthdays/", response_model=List[BirthdayResponse])
 async def get_contacts_with_upcoming_birthdays(
+    request: Request,
     days: int = 7,
     start_date: Optional[date] = None,
-    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     try:
-        return await get_upcoming_birthdays(db, current_user, days, start_date)
+        return await response_cache.respond(
+            request,
+            current_user.id,
+            lambda: get_upcoming_birthdays(
+                db, current_user, days, start_date, skip, limit
+            ),
+            dump,
+            # The window moves with the calendar when no start_date is given
+            vary=str(start_date or date.today()),
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -1,11 +1,12 @@
 import logging
 
+from typing import Optional
+
 from fastapi import (
     APIRouter,
     HTTPException,
     status,
     UploadFile,
-    BackgroundTasks,
     Depends,
     File,
 )
@@ -13,22 +14,28 @@ from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.connect import get_db
-from src.schemas.schemas import UserCreate, UserResponse, Token, RequestEmail
+from src.database.connect import get_db, get_replica_db
+from src.database.models import User
+from src.schemas.schemas import (
+    UserCreate,
+    UserResponse,
+    Token,
+    RefreshRequest,
+    RequestEmail,
+)
 from src.services.email import send_verification_email
 from src.services.auth import auth_service
 from src.services.base import settings
-from src.services.get_upload import get_upload_file_service
+from src.services.get_upload import UploadFileService, get_upload_file_service
 from src.repository.users import (
     create_user,
     get_user_by_email,
     confirm_email,
+    update_avatar_url,
 )
 
-
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/users", tags=["users"])
-upload_service = get_upload_file_service()
 
 
 @router.post(
@@ -36,26 +43,30 @@ upload_service = get_upload_file_service()
 )
 async def register_user(
     user: UserCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
     db_user = await create_user(user, db)
     token = await auth_service.create_email_token({"sub": db_user.email})
-    background_tasks.add_task(
-        send_verification_email, db_user.email, token, str(settings.BASE_URL)
-    )
+    await send_verification_email(db_user.email, token, str(settings.BASE_URL))
     return db_user
 
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_replica_db),
+    primary_db: AsyncSession = Depends(get_db),
 ):
     email = form_data.username
     user_model = await get_user_by_email(email, db)
-
-    if not user_model or not auth_service.verify_password(
+    if user_model is None:
+        # May have just registered and not reached the replica yet
+        user_model = await get_user_by_email(email, primary_db)
+    # Hand the connections back to the pool before the slow bcrypt check
+    await db.close()
+    await primary_db.close()
+
+    if not user_model or not await auth_service.verify_password(
         form_data.password, user_model.hashed_password
     ):
         logger.warning(f"Failed login attempt for user: {form_data.username}")
@@ -65,15 +76,31 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = await auth_service.create_access_token({"sub": user_model.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await auth_service.create_token_pair(user_model.email)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh_token(body: RefreshRequest):
+    """New access and refresh tokens; the presented refresh token is spent"""
+    return await auth_service.refresh_tokens(body.refresh_token)
+
+
+@router.post("/logout")
+async def logout(
+    body: Optional[RefreshRequest] = None,
+    token: str = Depends(auth_service.oauth2_scheme),
+):
+    """Revoke the access token and, if given, the refresh token"""
+    await auth_service.revoke_token(token, "access_token")
+    if body is not None:
+        await auth_service.revoke_token(body.refresh_token, "refresh_token")
+    return {"message": "Logged out successfully"}
 
 
 @router.post("/request_email")
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_replica_db),
 ):
     user = await get_user_by_email(body.email, db)
 
@@ -88,9 +115,7 @@ async def request_email(
         )
 
     token = await auth_service.create_email_token({"sub": user.email})
-    background_tasks.add_task(
-        send_verification_email, body.email, token, str(settings.BASE_URL)
-    )
+    await send_verification_email(body.email, token, str(settings.BASE_URL))
     return {"message": "Verification email sent successfully"}
 
 
@@ -100,17 +125,9 @@ async def verify_email(
     db: AsyncSession = Depends(get_db),
 ):
     email = await auth_service.get_email_from_token(token)
-    user = await get_user_by_email(email, db)
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    if user.is_verified:
+    if not await confirm_email(email, db):
         return {"message": "Email already verified"}
-
-    await confirm_email(email, db)
     return {"message": "Email verified successfully"}
 
 
@@ -120,7 +137,7 @@ async def verify_email(
     dependencies=[Depends(RateLimiter(times=5, seconds=60))],
 )
 async def read_users_me(
-    current_user: UserResponse = Depends(auth_service.get_current_user),
+    current_user: User = Depends(auth_service.get_current_user),
 ):
     return current_user
 
@@ -128,11 +145,14 @@ async def read_users_me(
 @router.patch("/me/avatar", response_model=UserResponse)
 async def update_avatar(
     file: UploadFile = File(),
-    current_user: UserResponse = Depends(auth_service.get_current_user),
+    current_user: User = Depends(auth_service.get_current_user),
     db: AsyncSession = Depends(get_db),
+    upload_service: UploadFileService = Depends(get_upload_file_service),
 ):
     try:
-        image_url = upload_service.upload_file(file, current_user.email)
+        image_url = await upload_service.upload_file(file)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to upload avatar: {e}")
         raise HTTPException(
@@ -140,10 +160,13 @@ async def update_avatar(
             detail="Failed to upload avatar",
         )
 
-    user = await get_user_by_email(current_user.email, db)
-    user.avatar_url = image_url
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    if image_url == current_user.avatar_url:
+        return UserResponse.model_validate(current_user)
+    user = await update_avatar_url(current_user.email, image_url, db)
+    if user is None:
+        # Deleted since the token was checked
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
 
     return UserResponse.model_validate(user)
@@ -1,8 +1,8 @@
 """Data Validation with Pydantic - ensures data sent to API is valid"""
 
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import BaseModel, EmailStr, ConfigDict, model_validator
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 
 # Contact Schemas
@@ -28,13 +28,86 @@ class ContactUpdate(BaseModel):
     additional_data: Optional[str] = None
 
 
+class ContactFilter(BaseModel):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    query: Optional[str] = None
+
+
+class ContactBulkSelection(BaseModel):
+    """Contacts targeted by a bulk operation; ids and filter combine with AND"""
+
+    ids: Optional[List[int]] = None
+    filter: Optional[ContactFilter] = None
+
+    @model_validator(mode="after")
+    def require_selection(self):
+        if not self.ids and not (
+            self.filter and self.filter.model_dump(exclude_none=True)
+        ):
+            raise ValueError("Provide contact ids or a non-empty filter")
+        return self
+
+
+class ContactBulkUpdate(ContactBulkSelection):
+    update: ContactUpdate
+
+
+class BulkOperationResponse(BaseModel):
+    affected: int
+    ids: List[int]
+
+
+class DedupeResponse(BaseModel):
+    by: str
+    dry_run: bool
+    groups: int
+    merged: int
+
+
+class DomainCount(BaseModel):
+    domain: str
+    count: int
+
+
+class ContactStatsResponse(BaseModel):
+    total: int
+    # Twelve counts, January first
+    birthdays_by_month: List[int]
+    email_domains: List[DomainCount]
+
+
 class ContactResponse(ContactBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
 
 
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ImportSummary(BaseModel):
+    format: str
+    processed: int
+    imported: int
+    failed: int
+    duplicates: int = 0
+    errors: List[ImportRowError]
+    elapsed_seconds: float
+    rows_per_second: float
+
+
 class BirthdayResponse(BaseModel):
     message: str
+    id: int
+    first_name: str
+    last_name: str
+    birthday: date
+    next_birthday: date
+    days_until: int
 
 
 # User Schemas
@@ -54,8 +127,13 @@ class UserResponse(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class RequestEmail(BaseModel):
     email: EmailStr
@@ -1,3 +1,7 @@
+import asyncio
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
@@ -6,35 +10,166 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from src.services.base import settings
-from src.database.connect import get_db
+from src.services.cache import TwoTierCache
+from src.services.metrics import Counter, Gauge, Histogram
+from src.services.revocation import revocation_list
+from src.database.connect import (
+    get_db,
+    client,
+    async_session,
+    read_session,
+    read_your_writes,
+)
+from src.database.models import User
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Columns kept for cached principals; the password hash never leaves the DB
+USER_CACHE_FIELDS = ("id", "email", "is_verified", "avatar_url")
+
+user_cache = TwoTierCache(
+    "users",
+    client,
+    local_maxsize=settings.USER_CACHE_SIZE,
+    local_ttl=settings.USER_CACHE_LOCAL_TTL,
+    remote_ttl=settings.USER_CACHE_TTL,
+)
+
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt call time including the wait for a hashing thread",
+    ("operation",),
+)
+password_hash_pending = Gauge(
+    "password_hash_pending", "bcrypt calls queued or running in this worker"
+)
+password_hash_rejected = Counter(
+    "password_hash_rejected_total", "bcrypt calls shed because the queue was full"
+)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool off the event loop.
+
+    bcrypt releases the GIL, so threads give real parallelism here. At most
+    `max_pending` calls may be queued or running per worker; beyond that
+    callers fail fast with 503 instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            logger.warning("Password hashing queue is full, shedding request")
+            password_hash_rejected.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        password_hash_pending.set(self.pending)
+        try:
+            with password_hash_duration.time(operation=func.__name__):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            password_hash_pending.set(self.pending)
+
+
+def credentials_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 
 class Auth:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
+    password_hasher = PasswordHasher(
+        settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING
+    )
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.password_hasher.run(
+            self.pwd_context.verify, plain_password, hashed_password
+        )
 
-    def get_password_hash(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await self.password_hasher.run(self.pwd_context.hash, password)
 
     async def create_access_token(
         self, data: dict, expires_delta: float = settings.JWT_EXPIRE_MINUTES
     ) -> str:
-        to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(minutes=expires_delta)
-        to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
-        )
+        return self._encode(data, "access_token", timedelta(minutes=expires_delta))
+
+    async def create_refresh_token(
+        self, data: dict, expires_delta: float = settings.JWT_REFRESH_EXPIRE_DAYS
+    ) -> str:
+        return self._encode(data, "refresh_token", timedelta(days=expires_delta))
+
+    async def create_token_pair(self, email: str) -> dict:
+        return {
+            "access_token": await self.create_access_token({"sub": email}),
+            "refresh_token": await self.create_refresh_token({"sub": email}),
+            "token_type": "bearer",
+        }
+
+    def _encode(self, data: dict, scope: str, lifetime: timedelta) -> str:
+        now = datetime.utcnow()
+        to_encode = {
+            **data,
+            "iat": now,
+            "exp": now + lifetime,
+            "scope": scope,
+            # Unique per token, the handle used to revoke it
+            "jti": uuid.uuid4().hex,
+        }
         return jwt.encode(
             to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM
         )
 
+    def decode_token(self, token: str, scope: str) -> dict:
+        """Claims of a valid, unexpired token of `scope`; 401 otherwise"""
+        try:
+            payload = jwt.decode(
+                token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
+            )
+        except JWTError:
+            raise credentials_error()
+        if payload.get("scope") != scope:
+            raise credentials_error()
+        # Tokens issued before revocation existed carry no jti
+        if payload.get("sub") is None or payload.get("jti") is None:
+            raise credentials_error()
+        return payload
+
+    async def refresh_tokens(self, refresh_token: str) -> dict:
+        """Trade a refresh token for a new access/refresh pair.
+
+        Refresh tokens are single use: the presented one is revoked with an
+        atomic set-if-absent, so a replayed or revoked token is refused even
+        when two requests race with it.
+        """
+        payload = self.decode_token(refresh_token, "refresh_token")
+        if not await revocation_list.revoke(payload["jti"], payload["exp"]):
+            raise credentials_error()
+        return await self.create_token_pair(payload["sub"])
+
+    async def revoke_token(self, token: str, scope: str):
+        payload = self.decode_token(token, scope)
+        await revocation_list.revoke(payload["jti"], payload["exp"])
+
     async def create_email_token(self, data: dict) -> str:
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(hours=1)
@@ -49,30 +184,36 @@ class Auth:
     async def get_current_user(
         self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ):
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        try:
-            payload = jwt.decode(
-                token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-            )
-            if payload.get("scope") != "access_token":
-                raise credentials_exception
-            email = payload.get("sub")
-            if email is None:
-                raise credentials_exception
-        except JWTError:
-            raise credentials_exception
+        payload = self.decode_token(token, "access_token")
+        # Answered from the in-memory filter unless the token may be revoked
+        if await revocation_list.is_revoked(payload["jti"]):
+            raise credentials_error()
+        email = payload["sub"]
 
-        from src.repository.users import get_user_by_email
+        cached = await user_cache.get(email)
+        if cached is not None:
+            # Detached principal: enough for ownership checks and responses,
+            # reload through the session before mutating it.
+            user = User(**cached)
+        else:
+            from src.repository.users import get_user_by_email
 
-        user = await get_user_by_email(email, db)
-        if user is None:
-            raise credentials_exception
+            # Cache fills read the primary so an invalidation right after a
+            # write is never re-populated from a lagging replica.
+            user = await get_user_by_email(email, db)
+            if user is None:
+                raise credentials_error()
+            await user_cache.set(
+                email, {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+            )
+        # Lets get_db pin this user's reads to the primary after a commit
+        db.info["user_id"] = user.id
         return user
 
+    async def invalidate_user(self, email: str):
+        """Drop the cached principal after any change to the user's row"""
+        await user_cache.delete(email)
+
     async def get_email_from_token(self, token: str) -> str:
         try:
             payload = jwt.decode(
@@ -90,3 +231,17 @@ class Auth:
 
 
 auth_service = Auth()
+
+
+async def get_read_db(current_user: User = Depends(auth_service.get_current_user)):
+    """Session for the current user's reads.
+
+    Served by the replica unless the user committed a write within the last
+    DB_STICKY_SECONDS, in which case the primary keeps reads consistent.
+    """
+    pinned = await read_your_writes.is_pinned(current_user.id)
+    async with (async_session if pinned else read_session)() as db:
+        try:
+            yield db
+        finally:
+            await db.close()
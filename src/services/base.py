@@ -1,25 +1,84 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DATABASE_REPLICA_URL: Optional[str] = None
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    DB_STICKY_SECONDS: float = 5.0
+    SQL_SLOW_QUERY_MS: float = 200.0
+    SQL_EXPLAIN_SLOW_QUERIES: bool = True
+    SQL_MAX_QUERIES_PER_REQUEST: int = 0
+    SQL_REPEATED_QUERY_WARNING: int = 10
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_LIMIT_INITIAL: int = 20
+    CONCURRENCY_LIMIT_MIN: int = 2
+    CONCURRENCY_LIMIT_MAX: int = 200
+    CONCURRENCY_LATENCY_TOLERANCE: float = 2.0
+    CONCURRENCY_QUEUE_SIZE: int = 50
+    CONCURRENCY_QUEUE_TIMEOUT: float = 1.0
     JWT_SECRET: str
     JWT_ALGORITHM: str
     JWT_EXPIRE_MINUTES: int
+    JWT_REFRESH_EXPIRE_DAYS: int = 7
+    TOKEN_REVOCATION_CAPACITY: int = 100_000
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_REBUILD_INTERVAL: float = 600.0
     CLOUDINARY_CLOUD_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
+    AVATAR_STORAGE: str = "cloudinary"
+    AVATAR_LOCAL_DIR: str = "media/avatars"
+    AVATAR_LOCAL_URL: str = "/media/avatars"
+    AVATAR_SIZE: int = 250
+    AVATAR_MAX_BYTES: int = 5 * 1024 * 1024
+    AVATAR_MAX_PIXELS: int = 25_000_000
+    AVATAR_INDEX_TTL: int = 30 * 24 * 3600
     SMTP_SERVER: str
     SMTP_PORT: int
     SMTP_USER: str
     SMTP_PASSWORD: str
+    SMTP_STARTTLS: bool = True
+    SMTP_USE_CREDENTIALS: bool = True
+    SMTP_VALIDATE_CERTS: bool = True
+    SMTP_TIMEOUT: int = 30
     MAIL_FROM_EMAIL: str
+    MAIL_DISPATCHER_NAME: Optional[str] = None
+    MAIL_CONNECTIONS: int = 2
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_IDLE_TIMEOUT: float = 60.0
+    MAIL_HEARTBEAT_TTL: int = 30
+    MAIL_MAX_ATTEMPTS: int = 5
+    MAIL_RETRY_BACKOFF: float = 5.0
+    MAIL_RETRY_BACKOFF_MAX: float = 900.0
+    MAIL_METRICS_PORT: int = 9101
+    BIRTHDAY_DIGEST_HOUR: int = 8
+    BIRTHDAY_DIGEST_DAYS: int = 7
+    BIRTHDAY_DIGEST_BATCH_SIZE: int = 500
+    BIRTHDAY_DIGEST_MAX_CONTACTS: int = 50
+    BIRTHDAY_DIGEST_LOCK_TTL: int = 300
+    BIRTHDAY_DIGEST_POLL_INTERVAL: float = 60.0
     BASE_URL: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     PGADMIN_DEFAULT_EMAIL: str
     PGADMIN_DEFAULT_PASSWORD: str
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_LOCAL_TTL: int = 15
+    USER_CACHE_SIZE: int = 10000
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+    EXPORT_FETCH_SIZE: int = 1000
+    RESPONSE_CACHE_TTL: int = 300
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,255 @@
+"""Daily birthday digest worker.
+
+Once a day, after BIRTHDAY_DIGEST_HOUR local time, mails every verified user
+the contacts with a birthday in the next BIRTHDAY_DIGEST_DAYS days. All users
+are served by one streamed query; digests go to the mail queue in batches
+and are delivered by `src.services.mail_dispatcher`.
+
+Any number of instances may run: a Redis lock lets one of them do the day's
+run, and a checkpoint written with each batch lets another resume where a
+crashed one stopped, without mailing anyone twice. Run the scheduler, or a
+single run for a given day:
+
+    python -m src.services.birthday_digest
+    python -m src.services.birthday_digest --once --date 2026-10-18
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import time
+import uuid
+
+from datetime import date, datetime
+from typing import List, Optional
+
+from src.database.connect import client, read_session
+from src.repository.contacts import next_birthday, stream_upcoming_birthdays
+from src.services.base import settings
+from src.services.mail_queue import MailQueue, mail_queue
+
+logger = logging.getLogger(__name__)
+
+# Only the holder of the lock may release or extend it
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+EXTEND_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """Expiring lock owned by a random token, so a node that stalls past the
+    TTL cannot release or extend a lock another node has taken over."""
+
+    def __init__(self, redis_client, key: str, ttl: int):
+        self.redis = redis_client
+        self.key = key
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self._release = redis_client.register_script(RELEASE_LOCK)
+        self._extend = redis_client.register_script(EXTEND_LOCK)
+
+    async def acquire(self) -> bool:
+        return bool(await self.redis.set(self.key, self.token, nx=True, ex=self.ttl))
+
+    async def extend(self) -> bool:
+        return bool(await self._extend(keys=[self.key], args=[self.token, self.ttl]))
+
+    async def release(self):
+        await self._release(keys=[self.key], args=[self.token])
+
+
+class LockLost(Exception):
+    pass
+
+
+class BirthdayDigest:
+    """Compute and queue the birthday digests of one day.
+
+    Progress lives in Redis under `<prefix>:<day>:*`: the id of the last
+    user whose digest is queued (`checkpoint`) and a `done` marker. Each
+    batch of jobs is pushed in the same MULTI/EXEC as the checkpoint, so
+    after a crash the next run starts exactly after the last queued digest.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        queue: MailQueue,
+        days: int = 7,
+        batch_size: int = 500,
+        max_contacts: int = 50,
+        lock_ttl: int = 300,
+        prefix: str = "birthday_digest",
+    ):
+        self.redis = redis_client
+        self.queue = queue
+        self.days = days
+        self.batch_size = batch_size
+        self.max_contacts = max_contacts
+        self.lock_ttl = lock_ttl
+        self.prefix = prefix
+
+    def key(self, day: date, name: str) -> str:
+        return f"{self.prefix}:{day.isoformat()}:{name}"
+
+    async def run(self, day: date) -> dict:
+        """Queue the digests of `day` unless done or running elsewhere"""
+        if await self.redis.exists(self.key(day, "done")):
+            return {"day": day.isoformat(), "status": "done"}
+        lock = RedisLock(self.redis, self.key(day, "lock"), self.lock_ttl)
+        if not await lock.acquire():
+            return {"day": day.isoformat(), "status": "locked"}
+        try:
+            return await self._run(day, lock)
+        finally:
+            await lock.release()
+
+    async def _run(self, day: date, lock: RedisLock) -> dict:
+        started = time.perf_counter()
+        checkpoint = int(await self.redis.get(self.key(day, "checkpoint")) or 0)
+        if checkpoint:
+            logger.warning(f"Resuming birthday digest of {day} after user {checkpoint}")
+        users = contacts = 0
+        batch: List[dict] = []
+        user_id, rows = None, []
+
+        async def flush():
+            if batch:
+                await self._queue(day, batch, user_id, lock)
+                batch.clear()
+
+        async with read_session() as db:
+            async for row in stream_upcoming_birthdays(
+                db, day, self.days, after_user_id=checkpoint
+            ):
+                if row.user_id != user_id:
+                    if rows:
+                        batch.append(self._digest(day, rows))
+                        if len(batch) >= self.batch_size:
+                            await flush()
+                    user_id, rows = row.user_id, []
+                    users += 1
+                rows.append(row)
+                contacts += 1
+        if rows:
+            batch.append(self._digest(day, rows))
+        await flush()
+
+        # Keep the marker past midnight so late instances skip the day
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.key(day, "done"), 1, ex=2 * 24 * 3600)
+            pipe.delete(self.key(day, "checkpoint"))
+            await pipe.execute()
+        summary = {
+            "day": day.isoformat(),
+            "status": "sent",
+            "resumed_after": checkpoint,
+            "users": users,
+            "contacts": contacts,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(f"Birthday digest finished: {summary}")
+        return summary
+
+    def _digest(self, day: date, rows) -> dict:
+        birthdays = []
+        for row in rows[: self.max_contacts]:
+            upcoming = next_birthday(row.birthday, day)
+            birthdays.append(
+                {
+                    "id": row.id,
+                    "first_name": row.first_name,
+                    "last_name": row.last_name,
+                    "date": upcoming.strftime("%b %d"),
+                    "days_until": (upcoming - day).days,
+                }
+            )
+        context = {
+            "username": rows[0].user_email,
+            "days": self.days,
+            "birthdays": birthdays,
+            "more": max(len(rows) - self.max_contacts, 0),
+        }
+        return self.queue.job("birthday_digest", rows[0].user_email, context)
+
+    async def _queue(self, day: date, jobs: List[dict], last_user_id: int, lock):
+        # Checked before queueing: after losing the lock another node owns
+        # the checkpoint and would queue these digests again
+        if not await lock.extend():
+            raise LockLost(f"Lost the birthday digest lock of {day}")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self.queue.push(pipe, jobs)
+            pipe.set(self.key(day, "checkpoint"), last_user_id, ex=2 * 24 * 3600)
+            await pipe.execute()
+        logger.debug(f"Queued {len(jobs)} birthday digests up to user {last_user_id}")
+
+    async def serve(
+        self, hour: int, interval: float, stop: Optional[asyncio.Event] = None
+    ):
+        """Run each day once it is past `hour`, checking every `interval` s.
+
+        Cheap when the day is done or locked, and it lets any instance pick
+        up a run whose owner died once the lock expires.
+        """
+        stop = stop or asyncio.Event()
+        logger.info(f"Birthday digest scheduled daily after {hour:02d}:00")
+        while not stop.is_set():
+            now = datetime.now()
+            if now.hour >= hour:
+                try:
+                    await self.run(now.date())
+                except Exception as e:
+                    logger.error(f"Birthday digest of {now.date()} failed: {e}")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+birthday_digest = BirthdayDigest(
+    client,
+    mail_queue,
+    days=settings.BIRTHDAY_DIGEST_DAYS,
+    batch_size=settings.BIRTHDAY_DIGEST_BATCH_SIZE,
+    max_contacts=settings.BIRTHDAY_DIGEST_MAX_CONTACTS,
+    lock_ttl=settings.BIRTHDAY_DIGEST_LOCK_TTL,
+)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="run one day and exit")
+    parser.add_argument("--date", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    if args.once:
+        day = args.date or date.today()
+        print(json.dumps(asyncio.run(birthday_digest.run(day)), indent=2))
+        return
+
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await birthday_digest.serve(
+            settings.BIRTHDAY_DIGEST_HOUR, settings.BIRTHDAY_DIGEST_POLL_INTERVAL, stop
+        )
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from src.database.connect import client
+from src.services.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+_caches: Dict[str, object] = {}
+
+MISSING = object()
+
+
+class JsonSerializer:
+    """Default value codec; any object with `dumps` -> str and `loads` works"""
+
+    @staticmethod
+    def dumps(value: Any) -> str:
+        return json.dumps(value)
+
+    @staticmethod
+    def loads(raw: str) -> Any:
+        return json.loads(raw)
+
+
+class LocalCache:
+    """Per-worker LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheStats:
+    def __init__(self):
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.local_hits + self.remote_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "local_hits": self.local_hits,
+            "remote_hits": self.remote_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
+
+
+class TwoTierCache:
+    """A LocalCache (L1) in front of Redis (L2) shared by all workers.
+
+    Values go through `serializer` (JSON by default) on their way to Redis.
+    Redis failures degrade to misses so a cache outage never fails the
+    request. The L1 TTL bounds how long other workers may serve an entry
+    after `delete` was called on one of them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_client,
+        local_maxsize: int = 1024,
+        local_ttl: float = 15,
+        remote_ttl: int = 300,
+        serializer=JsonSerializer,
+    ):
+        self.name = name
+        self.redis = redis_client
+        self.local = LocalCache(local_maxsize, local_ttl)
+        self.remote_ttl = remote_ttl
+        self.serializer = serializer
+        self.stats = CacheStats()
+        register_cache(name, self)
+
+    def _remote_key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, MISSING)
+        if value is not MISSING:
+            self.stats.local_hits += 1
+            return value
+        try:
+            raw = await self.redis.get(self._remote_key(key))
+        except RedisError as e:
+            logger.warning(f"Cache {self.name}: Redis get failed: {e}")
+            raw = None
+        if raw is None:
+            self.stats.misses += 1
+            return default
+        value = self.serializer.loads(raw)
+        self.local.set(key, value)
+        self.stats.remote_hits += 1
+        return value
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        try:
+            await self.redis.set(
+                self._remote_key(key),
+                self.serializer.dumps(value),
+                ex=self.remote_ttl,
+            )
+        except RedisError as e:
+            logger.warning(f"Cache {self.name}: Redis set failed: {e}")
+
+    async def delete(self, key: str):
+        self.local.delete(key)
+        try:
+            await self.redis.delete(self._remote_key(key))
+        except RedisError as e:
+            logger.warning(f"Cache {self.name}: Redis delete failed: {e}")
+
+
+def register_cache(name: str, cache):
+    """Expose `cache.stats` through `cache_stats()` and the /metrics collector"""
+    _caches[name] = cache
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats.as_dict() for name, cache in _caches.items()}
+
+
+def _cache_metrics():
+    hits, misses = [], []
+    for name, cache in _caches.items():
+        stats = cache.stats.as_dict()
+        for tier in ("local", "remote", "not_modified"):
+            count = stats.get(f"{tier}_hits", stats.get(tier))
+            if count is not None:
+                hits.append(({"cache": name, "tier": tier}, count))
+        misses.append(({"cache": name}, stats["misses"]))
+    yield "cache_hits_total", "counter", "Cache hits by tier", hits
+    yield "cache_misses_total", "counter", "Cache misses", misses
+
+
+register_collector(_cache_metrics)
+
+
+def cached(
+    name: Optional[str] = None,
+    ttl: int = 300,
+    local_ttl: float = 30,
+    maxsize: int = 1024,
+    serializer=JsonSerializer,
+    key: Optional[Callable[..., str]] = None,
+    redis_client=None,
+):
+    """Memoize an async function in a TwoTierCache.
+
+    Concurrent misses for the same arguments share a single call of the
+    wrapped function. `key` maps the call arguments to a cache key; by
+    default they are hashed from their repr. The wrapper exposes the
+    underlying `cache` and an `invalidate(*args, **kwargs)` coroutine.
+    """
+
+    def decorator(func):
+        if not asyncio.iscoroutinefunction(func):
+            raise TypeError(f"{func.__qualname__} must be an async function")
+        cache = TwoTierCache(
+            name or f"{func.__module__}.{func.__qualname__}",
+            redis_client or client,
+            local_maxsize=maxsize,
+            local_ttl=local_ttl,
+            remote_ttl=ttl,
+            serializer=serializer,
+        )
+        in_flight: Dict[str, asyncio.Future] = {}
+
+        def make_key(*args, **kwargs) -> str:
+            if key:
+                return key(*args, **kwargs)
+            raw = repr((args, sorted(kwargs.items())))
+            return hashlib.sha1(raw.encode()).hexdigest()
+
+        async def load(cache_key: str, args, kwargs):
+            value = await func(*args, **kwargs)
+            await cache.set(cache_key, value)
+            return value
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = make_key(*args, **kwargs)
+            value = await cache.get(cache_key, MISSING)
+            if value is not MISSING:
+                return value
+            task = in_flight.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(load(cache_key, args, kwargs))
+                in_flight[cache_key] = task
+                task.add_done_callback(lambda _: in_flight.pop(cache_key, None))
+            # Shielded so one cancelled caller does not cancel the others
+            return await asyncio.shield(task)
+
+        async def invalidate(*args, **kwargs):
+            await cache.delete(make_key(*args, **kwargs))
+
+        wrapper.cache = cache
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
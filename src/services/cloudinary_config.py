@@ -1,29 +1,44 @@
+import io
+
+from pathlib import PurePosixPath
+
 import cloudinary
 import cloudinary.uploader
-from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from src.services.storage import FileStorage
+
 
+class CloudinaryFileStorage(FileStorage):
+    """Cloudinary-hosted files; the blocking SDK calls run in a worker thread"""
 
-class UploadFileService:
-    def __init__(self, cloud_name, api_key, api_secret):
-        self.cloud_name = cloud_name
-        self.api_key = api_key
-        self.api_secret = api_secret
+    def __init__(
+        self, cloud_name, api_key, api_secret, folder: str = "RestApp/avatars"
+    ):
+        self.folder = folder
         cloudinary.config(
-            cloud_name=self.cloud_name,
-            api_key=self.api_key,
-            api_secret=self.api_secret,
+            cloud_name=cloud_name,
+            api_key=api_key,
+            api_secret=api_secret,
             secure=True,
         )
 
-    def upload_file(self, file: UploadFile, username: str) -> str:
-        public_id = f"RestApp/{username}"
-        try:
-            r = cloudinary.uploader.upload(
-                file.file, public_id=public_id, overwrite=True
-            )
-            src_url = cloudinary.CloudinaryImage(public_id).build_url(
-                width=250, height=250, crop="fill", version=r.get("version")
-            )
-            return src_url
-        except Exception as e:
-            raise Exception(f"Failed to upload file: {str(e)}")
+    def _public_id(self, key: str) -> str:
+        return f"{self.folder}/{PurePosixPath(key).with_suffix('')}"
+
+    async def save(self, key: str, data: bytes, content_type: str) -> str:
+        # With overwrite=False an existing public id is kept and returned, so
+        # storing a known key costs one Upload API call and no Admin API call
+        r = await run_in_threadpool(
+            cloudinary.uploader.upload,
+            io.BytesIO(data),
+            public_id=self._public_id(key),
+            overwrite=False,
+            resource_type="image",
+        )
+        return r["secure_url"]
+
+    def url(self, key: str) -> str:
+        return cloudinary.CloudinaryImage(self._public_id(key)).build_url(
+            format=PurePosixPath(key).suffix.lstrip(".")
+        )
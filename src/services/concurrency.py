@@ -0,0 +1,321 @@
+import asyncio
+import re
+import time
+
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+
+from src.services.metrics import Counter, Gauge, Histogram
+
+concurrency_limit = Gauge(
+    "concurrency_limit", "Adaptive limit on requests served at once by this worker"
+)
+concurrency_in_flight = Gauge(
+    "concurrency_in_flight", "Admitted requests by priority class", ("priority",)
+)
+concurrency_queued = Gauge(
+    "concurrency_queued", "Requests waiting for admission", ("priority",)
+)
+concurrency_rejected = Counter(
+    "concurrency_rejected_total",
+    "Requests shed with 503 by priority class and reason",
+    ("priority", "reason"),
+)
+concurrency_queue_wait = Histogram(
+    "concurrency_queue_wait_seconds",
+    "Time admitted requests spent waiting in the queue",
+    ("priority",),
+)
+
+
+class AIMDLimit:
+    """Additive-increase/multiplicative-decrease concurrency limit.
+
+    Latency is averaged over windows of `window` seconds and compared with a
+    baseline, the lowest window average seen, i.e. latency without queueing.
+    A window slower than `tolerance` times the baseline, or one with failures,
+    cuts the limit by `backoff`; a window that kept the limit saturated and
+    stayed fast raises it by one. The baseline creeps up by 10% every
+    `baseline_ttl` seconds so it follows organic growth such as larger tables
+    without ever being captured by an overload.
+    """
+
+    def __init__(
+        self,
+        initial: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        window: float = 1.0,
+        min_samples: int = 10,
+        baseline_ttl: float = 60.0,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.min_samples = min_samples
+        self.baseline_ttl = baseline_ttl
+        self.baseline: Optional[float] = None
+        self._baseline_refreshed = time.monotonic()
+        self._reset_window(time.monotonic())
+
+    def _reset_window(self, now: float):
+        self._window_started = now
+        self._samples = 0
+        self._total = 0.0
+        self._failures = 0
+        self._saturated = False
+
+    def record(self, latency: float, in_flight: int, failed: bool = False):
+        """Adds one completed request; `in_flight` counts it too"""
+        self._samples += 1
+        self._total += latency
+        self._failures += failed
+        self._saturated = self._saturated or in_flight >= int(self.limit)
+        now = time.monotonic()
+        if now - self._window_started < self.window:
+            return
+        if self._samples >= self.min_samples or self._failures:
+            self._update(self._total / self._samples, now)
+        self._reset_window(now)
+
+    def _update(self, average: float, now: float):
+        if self.baseline is None or average < self.baseline:
+            self.baseline = average
+            self._baseline_refreshed = now
+        elif now - self._baseline_refreshed >= self.baseline_ttl:
+            self.baseline *= 1.1
+            self._baseline_refreshed = now
+
+        if self._failures or average > self.baseline * self.tolerance:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self._saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        concurrency_limit.set(int(self.limit))
+
+
+class PriorityClass:
+    """Admission policy for one group of routes.
+
+    Lower `priority` values are admitted first whenever a slot frees up.
+    A class may only occupy `share` of the limit, which keeps headroom for
+    the classes above it. At most `queue_size` requests wait for a slot, each
+    for up to `timeout` seconds, before being shed with 503. Only `adaptive`
+    classes feed their latency into the limit, so that slow-by-design work
+    such as bcrypt or bulk import does not read as overload.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        priority: int,
+        share: float = 1.0,
+        queue_size: int = 50,
+        timeout: float = 1.0,
+        retry_after: int = 1,
+        adaptive: bool = True,
+    ):
+        self.name = name
+        self.priority = priority
+        self.share = share
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+
+# Checked in order against "METHOD /path"; the first match wins
+DEFAULT_RULES: List[Tuple[str, str]] = [
+    (r"^GET /(metrics|api/healthchecker)$", "critical"),
+    (r"^POST /api/users/(login|register|request_email|refresh|logout)$", "auth"),
+    (r"^\w+ /api/contacts/contacts/(import|export|bulk|dedupe)", "bulk"),
+    (r"^(GET|HEAD) ", "read"),
+    (r"", "write"),
+]
+
+
+def default_classes(queue_size: int = 50, timeout: float = 1.0) -> List[PriorityClass]:
+    return [
+        PriorityClass("read", 0, queue_size=queue_size, timeout=timeout),
+        PriorityClass("write", 1, queue_size=queue_size, timeout=timeout),
+        PriorityClass(
+            "auth",
+            2,
+            share=0.5,
+            queue_size=queue_size // 2,
+            timeout=timeout,
+            adaptive=False,
+        ),
+        PriorityClass(
+            "bulk",
+            3,
+            share=0.25,
+            queue_size=queue_size // 5,
+            timeout=timeout / 2,
+            retry_after=5,
+            adaptive=False,
+        ),
+    ]
+
+
+class ConcurrencyLimitMiddleware:
+    """Caps the requests this worker serves at once and sheds the excess.
+
+    Requests above the adaptive limit wait in a bounded queue per priority
+    class and are answered with a fast `503` and `Retry-After` when the queue
+    is full or their wait exceeds the class timeout, rather than piling up on
+    the connection pool and bcrypt until latency collapses for everyone.
+    Routes matched to `critical` (health checks, metrics) are never limited.
+    """
+
+    def __init__(
+        self,
+        app,
+        limit: Optional[AIMDLimit] = None,
+        classes: Optional[Sequence[PriorityClass]] = None,
+        rules: Sequence[Tuple[str, str]] = DEFAULT_RULES,
+    ):
+        self.app = app
+        self.limit = limit or AIMDLimit()
+        self.classes: Dict[str, PriorityClass] = {
+            priority_class.name: priority_class
+            for priority_class in classes or default_classes()
+        }
+        self._ordered = sorted(self.classes.values(), key=lambda c: c.priority)
+        self.rules = [(re.compile(pattern), name) for pattern, name in rules]
+        self.in_flight = 0
+        concurrency_limit.set(int(self.limit.limit))
+
+    def classify(self, method: str, path: str) -> str:
+        key = f"{method} {path}"
+        for pattern, name in self.rules:
+            if pattern.search(key):
+                return name
+        return "write"
+
+    def _has_capacity(self, priority_class: PriorityClass) -> bool:
+        limit = int(self.limit.limit)
+        return self.in_flight < limit and priority_class.in_flight < max(
+            1, int(limit * priority_class.share)
+        )
+
+    def _admit(self, priority_class: PriorityClass):
+        self.in_flight += 1
+        priority_class.in_flight += 1
+        concurrency_in_flight.set(
+            priority_class.in_flight, priority=priority_class.name
+        )
+
+    def _release(self, priority_class: PriorityClass):
+        self.in_flight -= 1
+        priority_class.in_flight -= 1
+        concurrency_in_flight.set(
+            priority_class.in_flight, priority=priority_class.name
+        )
+        self._wake()
+
+    def _wake(self):
+        """Hands free slots to queued requests, highest priority first"""
+        for priority_class in self._ordered:
+            waiters = priority_class.waiters
+            while waiters and self._has_capacity(priority_class):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self._admit(priority_class)
+                    waiter.set_result(None)
+            concurrency_queued.set(len(waiters), priority=priority_class.name)
+
+    async def _acquire(self, priority_class: PriorityClass) -> Optional[str]:
+        """Admits the request, or returns why it was shed"""
+        # Queued requests of the same or a higher priority go first
+        queued_ahead = any(
+            c.waiters for c in self._ordered if c.priority <= priority_class.priority
+        )
+        if not queued_ahead and self._has_capacity(priority_class):
+            self._admit(priority_class)
+            return None
+        if len(priority_class.waiters) >= priority_class.queue_size:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        priority_class.waiters.append(waiter)
+        concurrency_queued.set(
+            len(priority_class.waiters), priority=priority_class.name
+        )
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, priority_class.timeout)
+        except asyncio.TimeoutError:
+            # A slot may have been handed over just as the deadline passed
+            if not (waiter.done() and not waiter.cancelled()):
+                self._discard(priority_class, waiter)
+                return "timeout"
+        except asyncio.CancelledError:
+            # The client went away while queued
+            if waiter.done() and not waiter.cancelled():
+                self._release(priority_class)
+            else:
+                self._discard(priority_class, waiter)
+            raise
+        concurrency_queue_wait.observe(
+            time.perf_counter() - started, priority=priority_class.name
+        )
+        return None
+
+    def _discard(self, priority_class: PriorityClass, waiter: asyncio.Future):
+        try:
+            priority_class.waiters.remove(waiter)
+        except ValueError:
+            pass
+        concurrency_queued.set(
+            len(priority_class.waiters), priority=priority_class.name
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority_class = self.classes.get(self.classify(scope["method"], scope["path"]))
+        if priority_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self._acquire(priority_class)
+        if reason is not None:
+            concurrency_rejected.inc(priority=priority_class.name, reason=reason)
+            response = JSONResponse(
+                {"detail": "Server is overloaded, retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(priority_class.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if priority_class.adaptive:
+                self.limit.record(
+                    time.perf_counter() - started,
+                    self.in_flight,
+                    failed=status_code >= 500,
+                )
+            self._release(priority_class)
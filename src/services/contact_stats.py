@@ -0,0 +1,73 @@
+"""Verify or rebuild the per-user contact counters behind `/contacts/stats/`.
+
+The counters are maintained by triggers in the transaction of every write;
+this recounts them from the contacts table. `verify` reports drift and exits
+with status 1 if there is any, `rebuild` recomputes them (pausing contact
+writes while it runs). Prints a JSON summary:
+
+    python -m src.services.contact_stats verify
+    python -m src.services.contact_stats rebuild --user-email someone@example.com
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from src.database.connect import async_session
+from src.repository.contacts import rebuild_contact_stats, verify_contact_stats
+from src.repository.users import get_user_by_email
+
+logger = logging.getLogger(__name__)
+
+# Drifted counters listed in the summary; all of them are counted
+MAX_REPORTED = 100
+
+
+async def run(command: str, user_email: str = None) -> dict:
+    started = time.perf_counter()
+    async with async_session() as db:
+        user = None
+        if user_email:
+            user = await get_user_by_email(user_email, db)
+            if user is None:
+                raise SystemExit(f"User {user_email} not found")
+        if command == "rebuild":
+            summary = {"counters": await rebuild_contact_stats(db, user)}
+        else:
+            drift = await verify_contact_stats(db, user)
+            summary = {
+                "drifted": len(drift),
+                "drift": [
+                    dict(
+                        zip(("user_id", "dimension", "bucket", "stored", "actual"), row)
+                    )
+                    for row in drift[:MAX_REPORTED]
+                ],
+            }
+    summary = {
+        "command": command,
+        "user": user_email,
+        **summary,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Contact stats {command} finished: {summary}")
+    return summary
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--user-email", help="only this user's counters")
+    args = parser.parse_args()
+    summary = asyncio.run(run(args.command, args.user_email))
+    print(json.dumps(summary, indent=2))
+    if summary.get("drifted"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import csv
+import io
+import json
+import logging
+import time
+import zlib
+
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from src.database.connect import async_session, read_session, read_your_writes
+from src.database.models import User
+from src.repository.contacts import (
+    EXPORT_COLUMNS,
+    bulk_create_contacts,
+    stream_contacts,
+)
+from src.schemas.schemas import ContactCreate
+from src.services.base import settings
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+# Serialized rows are buffered up to this size before being sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def detect_format(file: UploadFile, requested: Optional[str] = None) -> str:
+    if requested:
+        return requested
+    name = (file.filename or "").lower()
+    content_type = (file.content_type or "").lower()
+    if name.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Cannot detect file format, pass format=csv or format=ndjson",
+    )
+
+
+def _iter_records(file: UploadFile, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row number, raw record) pairs, reading the upload incrementally.
+
+    Starlette spools uploads to a temporary file, so wrapping it in a text
+    reader keeps memory bounded by one line/record regardless of file size.
+    """
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            # Empty cells mean "not provided" so optional fields become None
+            yield number, {key: value for key, value in row.items() if value != ""}
+    else:
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            yield number, line
+
+
+def _validate(record: object) -> dict:
+    if isinstance(record, str):
+        record = json.loads(record)
+    return ContactCreate.model_validate(record).model_dump()
+
+
+def _iter_batches(
+    file: UploadFile, fmt: str, batch_size: int
+) -> Iterator[Tuple[List[dict], List[Tuple[int, List[str]]]]]:
+    valid, errors = [], []
+    for number, record in _iter_records(file, fmt):
+        try:
+            valid.append(_validate(record))
+        except ValidationError as e:
+            errors.append(
+                (
+                    number,
+                    [
+                        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+                        for err in e.errors()
+                    ],
+                )
+            )
+        except ValueError as e:
+            errors.append((number, [f"Invalid JSON: {e}"]))
+        if len(valid) + len(errors) >= batch_size:
+            yield valid, errors
+            valid, errors = [], []
+    if valid or errors:
+        yield valid, errors
+
+
+async def import_contacts(
+    db: AsyncSession, file: UploadFile, fmt: str, user: User
+) -> dict:
+    """Stream-parse an upload and insert it batch by batch.
+
+    Parsing and validation run in a worker thread one batch at a time; each
+    valid batch is written with a single multi-row INSERT and committed, so
+    rows imported before a failure are kept. Rows whose email the user
+    already has are counted as duplicates and skipped.
+    """
+    started = time.perf_counter()
+    batches = _iter_batches(file, fmt, settings.IMPORT_BATCH_SIZE)
+    imported = failed = duplicates = 0
+    reported = []
+    while True:
+        try:
+            batch = await run_in_threadpool(next, batches, None)
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Malformed {fmt} file after "
+                f"{imported + duplicates + failed} rows: {e}",
+            )
+        if batch is None:
+            break
+        valid, errors = batch
+        inserted = await bulk_create_contacts(db, valid, user)
+        imported += inserted
+        duplicates += len(valid) - inserted
+        failed += len(errors)
+        room = settings.IMPORT_MAX_REPORTED_ERRORS - len(reported)
+        reported.extend(
+            {"row": number, "errors": messages} for number, messages in errors[:room]
+        )
+
+    elapsed = time.perf_counter() - started
+    processed = imported + duplicates + failed
+    logger.info(
+        f"Imported {imported}/{processed} contacts for user {user.id} in {elapsed:.2f}s"
+    )
+    return {
+        "format": fmt,
+        "processed": processed,
+        "imported": imported,
+        "failed": failed,
+        "duplicates": duplicates,
+        "errors": reported,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(processed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def _serialize_row(row, fmt: str, writer, buffer: io.StringIO):
+    if fmt == "csv":
+        writer.writerow(row)
+    else:
+        record = dict(row._mapping)
+        record["birthday"] = record["birthday"].isoformat()
+        buffer.write(json.dumps(record))
+        buffer.write("\n")
+
+
+async def export_contacts(
+    user: User, fmt: str, gzip: bool = False
+) -> AsyncIterator[bytes]:
+    """Stream all of the user's contacts as CSV or NDJSON chunks.
+
+    Rows come from a server-side cursor in a session owned by the generator,
+    since the request's session is closed before the response body is sent.
+    Like `get_read_db`, it reads from the replica unless the user wrote
+    within the last DB_STICKY_SECONDS, e.g. an import just before.
+    Memory use is bounded by one chunk regardless of the number of contacts.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(EXPORT_FIELDS)
+
+    def take_chunk() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    pinned = await read_your_writes.is_pinned(user.id)
+    async with (async_session if pinned else read_session)() as db:
+        async for row in stream_contacts(db, user, settings.EXPORT_FETCH_SIZE):
+            _serialize_row(row, fmt, writer, buffer)
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                chunk = take_chunk()
+                if chunk:
+                    yield chunk
+
+    chunk = take_chunk()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,55 @@
+"""Merge duplicate contacts of every user in one set-based pass.
+
+Run on demand or from a scheduler; prints a JSON summary:
+
+    python -m src.services.dedupe
+    python -m src.services.dedupe --by phone --dry-run
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from src.database.connect import async_session
+from src.repository.contacts import DEDUPE_KEYS, merge_duplicate_contacts
+from src.services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def dedupe(by: str, dry_run: bool = False) -> dict:
+    started = time.perf_counter()
+    async with async_session() as db:
+        affected = await merge_duplicate_contacts(db, by, dry_run=dry_run)
+    if not dry_run:
+        # Cached list responses of these users still show the merged contacts
+        for user_id, _, _ in affected:
+            await response_cache.bump(user_id)
+    elapsed = time.perf_counter() - started
+    summary = {
+        "by": by,
+        "dry_run": dry_run,
+        "users": len(affected),
+        "groups": sum(groups for _, groups, _ in affected),
+        "merged": sum(merged for _, _, merged in affected),
+        "elapsed_seconds": round(elapsed, 3),
+    }
+    logger.info(f"Contact dedupe finished: {summary}")
+    return summary
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--by", choices=list(DEDUPE_KEYS), default="email")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only count the duplicates"
+    )
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(dedupe(args.by, args.dry_run)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
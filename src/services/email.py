@@ -1,47 +1,63 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from email.message import EmailMessage
+from email.utils import formataddr
+from functools import lru_cache
 from pathlib import Path
 
 from src.services.base import settings
+from src.services.mail_queue import mail_queue
 
 import logging
 
 logger = logging.getLogger(__name__)
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.SMTP_USER,
-    MAIL_PASSWORD=settings.SMTP_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM_EMAIL,
-    MAIL_PORT=settings.SMTP_PORT,
-    MAIL_SERVER=settings.SMTP_SERVER,
-    MAIL_FROM_NAME="Contacts Management API",
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates",
-)
+MAIL_FROM_NAME = "Contacts Management API"
+
+# Template name -> (subject, template file)
+EMAIL_TEMPLATES = {
+    "verification": ("Email Confirmation", "email_template.html"),
+    "birthday_digest": ("Upcoming birthdays", "birthday_digest.html"),
+}
+
+
+@lru_cache(maxsize=None)
+def template_environment():
+    """Jinja environment built on first use; it caches compiled templates.
+
+    Only the mail dispatcher renders messages, so API workers never pay for
+    importing Jinja.
+    """
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    return Environment(
+        loader=FileSystemLoader(Path(__file__).parent / "templates"),
+        autoescape=select_autoescape(["html"]),
+        auto_reload=False,
+    )
+
+
+def render_message(job: dict) -> EmailMessage:
+    subject, template_name = EMAIL_TEMPLATES[job["template"]]
+    template = template_environment().get_template(template_name)
+    message = EmailMessage()
+    message["From"] = formataddr((MAIL_FROM_NAME, settings.MAIL_FROM_EMAIL))
+    message["To"] = job["to"]
+    message["Subject"] = subject
+    message.set_content(template.render(**job["context"]), subtype="html")
+    return message
 
 
 async def send_verification_email(email: str, token: str, BASE_URL: str):
+    """Queue the verification email for the mail dispatcher.
+
+    A queueing failure is logged rather than raised: the account is already
+    saved, and the user can ask for the email again via `/request_email`.
+    """
     try:
-        message = MessageSchema(
-            subject="Email Confirmation",
-            recipients=[email],
-            template_body={
-                "host": BASE_URL,
-                "username": email,
-                "token": token,
-            },
-            subtype=MessageType.html,
+        job_id = await mail_queue.enqueue(
+            "verification",
+            email,
+            {"host": BASE_URL, "username": email, "token": token},
         )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-        logger.info(f"Verification email sent to {email}")
-    except ConnectionErrors as e:
-        logger.error(f"Failed to send verification email to {email}: {e}")
-        raise
+        logger.info(f"Verification email {job_id} queued for {email}")
     except Exception as e:
-        logger.error(f"Unexpected error sending email to {email}: {e}")
-        raise
+        logger.error(f"Failed to queue verification email to {email}: {e}")
@@ -1,10 +1,208 @@
-from src.services.cloudinary_config import UploadFileService
+import hashlib
+import io
+import logging
+import time
+
+from functools import lru_cache
+from typing import Dict
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from src.database.connect import client
 from src.services.base import settings
+from src.services.cache import TwoTierCache
+from src.services.metrics import Histogram
+from src.services.storage import FileStorage, LocalFileStorage
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+ALLOWED_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+OUTPUT_FORMAT = "WEBP"
+OUTPUT_CONTENT_TYPE = "image/webp"
+
+avatar_upload_duration = Histogram(
+    "avatar_upload_duration_seconds",
+    "Avatar pipeline time from reading the upload to having a URL",
+    ("result",),
+)
+avatar_thumbnail_duration = Histogram(
+    "avatar_thumbnail_duration_seconds", "Decoding, resizing and encoding an avatar"
+)
+
+
+class UploadFileService:
+    """Avatar pipeline: capped read, local thumbnail, content-addressed store.
+
+    Identical uploads map to the same storage key, so they are resized and
+    stored once; `index` remembers the URLs of stored keys across workers.
+    """
+
+    def __init__(
+        self,
+        storage: FileStorage,
+        index: TwoTierCache,
+        size: int = 250,
+        max_bytes: int = 5 * 1024 * 1024,
+        max_pixels: int = 25_000_000,
+    ):
+        self.storage = storage
+        self.index = index
+        self.size = size
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+
+    async def upload_file(self, file: UploadFile) -> str:
+        started = time.perf_counter()
+        data = await self.read(file)
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{digest[:2]}/{digest}-{self.size}.webp"
+        url = await self.index.get(key)
+        result = "deduplicated"
+        if not url:
+            # Storage keeps the first copy of a key, so storing again is
+            # safe, and cheaper than asking a rate-limited API if it exists
+            url = await self._store(key, data)
+            result = "stored"
+            await self.index.set(key, url)
+        avatar_upload_duration.observe(time.perf_counter() - started, result=result)
+        return url
+
+    async def _store(self, key: str, data: bytes) -> str:
+        with avatar_thumbnail_duration.time():
+            thumbnail = await run_in_threadpool(self.thumbnail, data)
+        url = await self.storage.save(key, thumbnail, OUTPUT_CONTENT_TYPE)
+        logger.info(f"Stored avatar {key} ({len(data)} -> {len(thumbnail)} bytes)")
+        return url
+
+    async def read(self, file: UploadFile) -> bytes:
+        """Read the upload in chunks, rejecting it as soon as it exceeds the cap.
+
+        Only bounds what is kept in memory: the request body has already been
+        received by then, and is capped by `BodySizeLimitMiddleware`.
+        """
+        if file.size is not None and file.size > self.max_bytes:
+            raise self._too_large()
+        data = bytearray()
+        while chunk := await file.read(READ_CHUNK_SIZE):
+            data += chunk
+            if len(data) > self.max_bytes:
+                raise self._too_large()
+        if not data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file"
+            )
+        return bytes(data)
 
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Avatar must not exceed {self.max_bytes // 1024} KiB",
+        )
 
+    def thumbnail(self, data: bytes) -> bytes:
+        """Crop and resize to a square WebP; CPU-bound, run it in a thread"""
+        # Pillow is only needed once an avatar is uploaded, not to boot a worker
+        from PIL import Image, ImageOps, UnidentifiedImageError
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if image.format not in ALLOWED_FORMATS:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail=f"Unsupported image format {image.format}",
+                    )
+                if image.width * image.height > self.max_pixels:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Image dimensions are too large",
+                    )
+                # Lets JPEG decode straight at a reduced scale
+                image.draft("RGB", (self.size * 2, self.size * 2))
+                image = ImageOps.exif_transpose(image)
+                has_alpha = "A" in image.getbands() or "transparency" in image.info
+                image = ImageOps.fit(
+                    image.convert("RGBA" if has_alpha else "RGB"),
+                    (self.size, self.size),
+                    Image.Resampling.LANCZOS,
+                )
+                output = io.BytesIO()
+                image.save(output, OUTPUT_FORMAT, quality=85)
+                return output.getvalue()
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            logger.info(f"Rejected avatar upload: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file"
+            )
+
+
+class BodySizeLimitMiddleware:
+    """Caps the request bodies of the given paths before the app reads them.
+
+    A declared Content-Length over the cap is answered with `413` at once.
+    Otherwise bytes are counted as they arrive and the request fails with
+    `413` at the cap, so an oversized chunked body is never received whole
+    or spooled by the multipart parser.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse(
+                {"detail": f"Request body must not exceed {limit // 1024} KiB"},
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing, so FastAPI answers with it
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Request body must not exceed {limit // 1024} KiB",
+                    )
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+@lru_cache(maxsize=None)
 def get_upload_file_service() -> UploadFileService:
+    """Build the service on first use; also usable as a FastAPI dependency"""
+    if settings.AVATAR_STORAGE == "local":
+        storage = LocalFileStorage(settings.AVATAR_LOCAL_DIR, settings.AVATAR_LOCAL_URL)
+    else:
+        from src.services.cloudinary_config import CloudinaryFileStorage
+
+        storage = CloudinaryFileStorage(
+            cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+            api_key=settings.CLOUDINARY_API_KEY,
+            api_secret=settings.CLOUDINARY_API_SECRET,
+        )
     return UploadFileService(
-        cloud_name=settings.CLOUDINARY_CLOUD_NAME,
-        api_key=settings.CLOUDINARY_API_KEY,
-        api_secret=settings.CLOUDINARY_API_SECRET,
+        storage,
+        TwoTierCache("avatars", client, remote_ttl=settings.AVATAR_INDEX_TTL),
+        size=settings.AVATAR_SIZE,
+        max_bytes=settings.AVATAR_MAX_BYTES,
+        max_pixels=settings.AVATAR_MAX_PIXELS,
     )
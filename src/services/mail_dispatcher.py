@@ -0,0 +1,246 @@
+"""Mail delivery worker.
+
+Pulls jobs queued by `src.services.email` from Redis and sends them over a
+small pool of persistent SMTP connections. Run one or more instances next to
+the API:
+
+    python -m src.services.mail_dispatcher
+"""
+
+import asyncio
+import logging
+import signal
+import socket
+import time
+
+from typing import Callable, Optional
+
+from aiosmtplib import (
+    SMTP,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPResponseException,
+    SMTPServerDisconnected,
+)
+
+from src.services.base import settings
+from src.services.email import render_message
+from src.services.mail_queue import MailQueue, mail_queue
+from src.services.metrics import Counter, Gauge, Histogram, serve_metrics
+
+logger = logging.getLogger(__name__)
+
+mail_send_duration = Histogram(
+    "mail_send_duration_seconds",
+    "Rendering and sending one message, including any reconnect",
+)
+mail_jobs = Counter(
+    "mail_jobs_total", "Mail jobs handled by the dispatcher", ("result",)
+)
+mail_queue_jobs = Gauge("mail_queue_jobs", "Mail jobs waiting in Redis", ("state",))
+
+
+def smtp_options() -> dict:
+    options = {
+        "hostname": settings.SMTP_SERVER,
+        "port": settings.SMTP_PORT,
+        "start_tls": settings.SMTP_STARTTLS,
+        "validate_certs": settings.SMTP_VALIDATE_CERTS,
+        "timeout": settings.SMTP_TIMEOUT,
+    }
+    if settings.SMTP_USE_CREDENTIALS:
+        options["username"] = settings.SMTP_USER
+        options["password"] = settings.SMTP_PASSWORD
+    return options
+
+
+class SMTPConnection:
+    """One persistent SMTP session, (re)connected on demand.
+
+    Connecting performs STARTTLS and login once; every message after that
+    costs a single MAIL/RCPT/DATA exchange.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.smtp: Optional[SMTP] = None
+        self.last_used = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self.smtp is not None and self.smtp.is_connected
+
+    async def send(self, message):
+        if not self.connected:
+            await self.connect()
+        try:
+            await self.smtp.send_message(message)
+        except SMTPServerDisconnected:
+            # The server may drop idle sessions; retry once on a fresh one
+            await self.connect()
+            await self.smtp.send_message(message)
+        self.last_used = time.monotonic()
+
+    async def connect(self):
+        await self.close()
+        self.smtp = SMTP(**self.options)
+        await self.smtp.connect()
+
+    async def close(self):
+        if self.smtp is None:
+            return
+        smtp, self.smtp = self.smtp, None
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except SMTPException:
+            smtp.close()
+
+
+def is_permanent(error: Exception) -> bool:
+    """5xx replies will not succeed on retry"""
+    if isinstance(error, SMTPRecipientsRefused):
+        return all(recipient.code >= 500 for recipient in error.recipients)
+    return isinstance(error, SMTPResponseException) and error.code >= 500
+
+
+class MailDispatcher:
+    """Drain a MailQueue with `connections` concurrent SMTP sessions.
+
+    Each consumer claims up to `batch_size` jobs at once, sends them back to
+    back over its own connection and acknowledges them in one round trip.
+    Connections idle for longer than `idle_timeout` are closed. The
+    dispatcher renews its liveness key every second, valid for
+    `heartbeat_ttl` seconds, and requeues the jobs of dispatchers whose key
+    has expired as often.
+    """
+
+    def __init__(
+        self,
+        queue: MailQueue,
+        connections: int = 2,
+        batch_size: int = 50,
+        idle_timeout: float = 60.0,
+        heartbeat_ttl: int = 30,
+        name: Optional[str] = None,
+        connection_factory: Optional[Callable[[], SMTPConnection]] = None,
+    ):
+        self.queue = queue
+        self.connections = connections
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.heartbeat_ttl = heartbeat_ttl
+        self.name = name or socket.gethostname()
+        self.connection_factory = connection_factory or (
+            lambda: SMTPConnection(**smtp_options())
+        )
+        self.sent = 0
+        self.failed = 0
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        # Alive before recovering, so no other dispatcher takes over our lists
+        await self.queue.heartbeat(self.name, self.heartbeat_ttl)
+        recovered = await self.queue.recover(self.name)
+        recovered += await self.queue.recover_abandoned()
+        if recovered:
+            logger.warning(f"Requeued {recovered} unacknowledged mail jobs")
+        logger.info(
+            f"Mail dispatcher {self.name} started with {self.connections} connections"
+        )
+        await asyncio.gather(
+            self._promote_retries(stop),
+            *(self._consume(index, stop) for index in range(self.connections)),
+        )
+        logger.info(f"Mail dispatcher stopped: {self.sent} sent, {self.failed} failed")
+
+    async def _promote_retries(self, stop: asyncio.Event):
+        recovered_at = time.monotonic()
+        while not stop.is_set():
+            try:
+                await self.queue.heartbeat(self.name, self.heartbeat_ttl)
+                if time.monotonic() - recovered_at > self.heartbeat_ttl:
+                    recovered_at = time.monotonic()
+                    recovered = await self.queue.recover_abandoned()
+                    if recovered:
+                        logger.warning(
+                            f"Requeued {recovered} mail jobs of stopped dispatchers"
+                        )
+                await self.queue.promote_due()
+                for state, count in (await self.queue.stats()).items():
+                    mail_queue_jobs.set(count, state=state)
+            except Exception as e:
+                logger.warning(f"Failed to promote mail retries: {e}")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _consume(self, index: int, stop: asyncio.Event):
+        consumer = f"{self.name}:{index}"
+        connection = self.connection_factory()
+        try:
+            while not stop.is_set():
+                try:
+                    jobs = await self.queue.claim(consumer, self.batch_size, 1.0)
+                except Exception as e:
+                    logger.warning(f"Mail queue unavailable: {e}")
+                    await asyncio.sleep(1.0)
+                    continue
+                if not jobs:
+                    idle = time.monotonic() - connection.last_used
+                    if connection.connected and idle > self.idle_timeout:
+                        await connection.close()
+                    continue
+                await self._deliver(consumer, connection, jobs)
+        finally:
+            await connection.close()
+
+    async def _deliver(self, consumer: str, connection: SMTPConnection, jobs):
+        delivered = []
+        for raw, job in jobs:
+            try:
+                with mail_send_duration.time():
+                    await connection.send(render_message(job))
+            except Exception as e:
+                logger.warning(f"Failed to send mail {job['id']} to {job['to']}: {e}")
+                self.failed += 1
+                permanent = is_permanent(e)
+                mail_jobs.inc(result="rejected" if permanent else "failed")
+                await self.queue.fail(consumer, raw, job, str(e), permanent)
+                if not permanent:
+                    # Possibly a broken session; the next message reconnects
+                    await connection.close()
+                continue
+            mail_jobs.inc(result="sent")
+            delivered.append(raw)
+        await self.queue.ack(consumer, delivered)
+        self.sent += len(delivered)
+        logger.debug(f"Sent {len(delivered)}/{len(jobs)} queued mails via {consumer}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    dispatcher = MailDispatcher(
+        mail_queue,
+        connections=settings.MAIL_CONNECTIONS,
+        batch_size=settings.MAIL_BATCH_SIZE,
+        idle_timeout=settings.MAIL_IDLE_TIMEOUT,
+        heartbeat_ttl=settings.MAIL_HEARTBEAT_TTL,
+        name=settings.MAIL_DISPATCHER_NAME,
+    )
+
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        if settings.MAIL_METRICS_PORT:
+            await serve_metrics("0.0.0.0", settings.MAIL_METRICS_PORT)
+        await dispatcher.run(stop)
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
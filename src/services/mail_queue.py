@@ -0,0 +1,184 @@
+import json
+import logging
+import time
+import uuid
+
+from typing import List, Tuple
+
+from src.database.connect import client
+from src.services.base import settings
+
+logger = logging.getLogger(__name__)
+
+# Atomically move up to ARGV[2] jobs whose retry time has passed back onto
+# the queue, so concurrent dispatchers never deliver a retried job twice
+PROMOTE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('LPUSH', KEYS[2], job)
+end
+return #due
+"""
+
+
+class MailQueue:
+    """Durable Redis queue of outgoing mail jobs.
+
+    Jobs are JSON documents pushed onto `<prefix>:queue`. A consumer moves
+    each job to its own processing list while sending it, and its dispatcher
+    keeps an expiring `<prefix>:alive:<name>` key while running, so jobs held
+    by a crashed worker are recovered by its next run or, once that key has
+    expired, by any other dispatcher instead of lost. Failed jobs wait
+    in the `<prefix>:retry` sorted set, scored by the time they are due again,
+    and end up in `<prefix>:dead` after `max_attempts`.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        prefix: str = "mail",
+        max_attempts: int = 5,
+        backoff: float = 5.0,
+        backoff_max: float = 900.0,
+    ):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.queue_key = f"{prefix}:queue"
+        self.retry_key = f"{prefix}:retry"
+        self.dead_key = f"{prefix}:dead"
+        self._promote_due = redis_client.register_script(PROMOTE_DUE)
+
+    def processing_key(self, consumer: str) -> str:
+        return f"{self.prefix}:processing:{consumer}"
+
+    def alive_key(self, name: str) -> str:
+        return f"{self.prefix}:alive:{name}"
+
+    @staticmethod
+    def job(template: str, to: str, context: dict) -> dict:
+        return {
+            "id": uuid.uuid4().hex,
+            "template": template,
+            "to": to,
+            "context": context,
+            "attempts": 0,
+        }
+
+    async def enqueue(self, template: str, to: str, context: dict) -> str:
+        job = self.job(template, to, context)
+        await self.redis.lpush(self.queue_key, json.dumps(job))
+        return job["id"]
+
+    def push(self, pipe, jobs: List[dict]):
+        """Queue `jobs` in one command on the caller's pipeline.
+
+        Lets producers queue a batch atomically with their own bookkeeping,
+        e.g. a progress checkpoint in the same MULTI/EXEC.
+        """
+        pipe.lpush(self.queue_key, *(json.dumps(job) for job in jobs))
+
+    async def claim(
+        self, consumer: str, max_jobs: int, timeout: float
+    ) -> List[Tuple[str, dict]]:
+        """Block up to `timeout` seconds for a job, then take up to `max_jobs`"""
+        processing = self.processing_key(consumer)
+        raw = await self.redis.blmove(
+            self.queue_key, processing, timeout, "RIGHT", "LEFT"
+        )
+        if raw is None:
+            return []
+        raws = [raw]
+        if max_jobs > 1:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for _ in range(max_jobs - 1):
+                    pipe.lmove(self.queue_key, processing, "RIGHT", "LEFT")
+                raws.extend(raw for raw in await pipe.execute() if raw is not None)
+        return [(raw, json.loads(raw)) for raw in raws]
+
+    async def ack(self, consumer: str, raws: List[str]):
+        if not raws:
+            return
+        processing = self.processing_key(consumer)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for raw in raws:
+                pipe.lrem(processing, 1, raw)
+            await pipe.execute()
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.backoff * 2 ** (attempts - 1), self.backoff_max)
+
+    async def fail(
+        self, consumer: str, raw: str, job: dict, error: str, permanent: bool = False
+    ):
+        """Schedule a failed job for retry with exponential backoff, or bury it"""
+        job = {**job, "attempts": job["attempts"] + 1, "error": error}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key(consumer), 1, raw)
+            if permanent or job["attempts"] >= self.max_attempts:
+                logger.error(
+                    f"Giving up on mail {job['id']} to {job['to']} "
+                    f"after {job['attempts']} attempts: {error}"
+                )
+                pipe.lpush(self.dead_key, json.dumps(job))
+            else:
+                due = time.time() + self.retry_delay(job["attempts"])
+                pipe.zadd(self.retry_key, {json.dumps(job): due})
+            await pipe.execute()
+
+    async def promote_due(self, limit: int = 100) -> int:
+        return await self._promote_due(
+            keys=[self.retry_key, self.queue_key], args=[time.time(), limit]
+        )
+
+    async def heartbeat(self, name: str, ttl: int):
+        """Mark dispatcher `name` alive for the next `ttl` seconds"""
+        await self.redis.set(self.alive_key(name), 1, ex=ttl)
+
+    async def recover(self, name: str) -> int:
+        """Requeue jobs left in processing lists by a previous run of `name`"""
+        recovered = 0
+        match = f"{self.processing_key(name)}:*"
+        async for key in self.redis.scan_iter(match=match):
+            recovered += await self._requeue(key)
+        return recovered
+
+    async def recover_abandoned(self) -> int:
+        """Requeue jobs held by dispatchers that are no longer alive.
+
+        Covers workers that never come back under the same name, e.g. a
+        container recreated with a new hostname.
+        """
+        recovered = 0
+        start = len(self.processing_key(""))
+        async for key in self.redis.scan_iter(match=self.processing_key("*")):
+            # Consumers are named `<dispatcher name>:<index>`
+            name = key[start:].rsplit(":", 1)[0]
+            if not await self.redis.exists(self.alive_key(name)):
+                recovered += await self._requeue(key)
+        return recovered
+
+    async def _requeue(self, processing: str) -> int:
+        moved = 0
+        while await self.redis.lmove(processing, self.queue_key, "LEFT", "RIGHT"):
+            moved += 1
+        return moved
+
+    async def stats(self) -> dict:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self.queue_key)
+            pipe.zcard(self.retry_key)
+            pipe.llen(self.dead_key)
+            queued, retrying, dead = await pipe.execute()
+        return {"queued": queued, "retrying": retrying, "dead": dead}
+
+
+mail_queue = MailQueue(
+    client,
+    max_attempts=settings.MAIL_MAX_ATTEMPTS,
+    backoff=settings.MAIL_RETRY_BACKOFF,
+    backoff_max=settings.MAIL_RETRY_BACKOFF_MAX,
+)
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import time
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import orjson
+from fastapi import Request, Response, status
+from redis.exceptions import RedisError
+
+from src.database.connect import client, add_write_listener
+from src.services.base import settings
+from src.services.cache import CacheStats, register_cache
+from src.services.serialization import Serializer
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCacheStats(CacheStats):
+    def __init__(self):
+        super().__init__()
+        self.not_modified = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.remote_hits + self.not_modified
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {**super().as_dict(), "not_modified": self.not_modified}
+
+
+class ResponseCache:
+    """Per-user cache of serialized read responses with ETag support.
+
+    Every user has a version number in Redis that is bumped after each
+    committed write. ETags and cache keys embed it, so a write invalidates
+    all of the user's cached responses at once, and a matching
+    `If-None-Match` is answered with 304 from a single Redis GET.
+    """
+
+    def __init__(self, redis_client, ttl: int):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.stats = ResponseCacheStats()
+        register_cache("responses", self)
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"responses:version:{user_id}"
+
+    async def version(self, user_id: int) -> int:
+        key = self._version_key(user_id)
+        version = await self.redis.get(key)
+        if version is None:
+            # Start from a timestamp so a lost counter never reuses old keys
+            await self.redis.set(key, time.time_ns(), nx=True)
+            version = await self.redis.get(key)
+        return int(version)
+
+    async def bump(self, user_id: int):
+        try:
+            await self.redis.incr(self._version_key(user_id))
+        except RedisError as e:
+            logger.warning(f"Failed to bump response version for {user_id}: {e}")
+
+    async def respond(
+        self,
+        request: Request,
+        user_id: int,
+        compute: Callable[[], Awaitable[Any]],
+        serialize: Serializer,
+        headers: Optional[Callable[[Any], Dict[str, str]]] = None,
+        vary: str = "",
+    ) -> Response:
+        """Serve `compute()` encoded by `serialize`, from cache when possible.
+
+        `headers` derives extra response headers from the computed data; they
+        are cached with the body. `vary` adds implicit inputs (e.g. today's
+        date) to the cache key.
+        """
+        try:
+            version = await self.version(user_id)
+        except RedisError as e:
+            logger.warning(f"Response cache unavailable: {e}")
+            self.stats.misses += 1
+            data = await compute()
+            return self._response(serialize(data), headers(data) if headers else {})
+
+        query = sorted(request.query_params.multi_items())
+        fingerprint = hashlib.sha1(
+            f"{request.url.path}?{query}|{vary}".encode()
+        ).hexdigest()[:16]
+        etag = f'W/"{user_id}-{version}-{fingerprint}"'
+        if etag in request.headers.get("if-none-match", ""):
+            self.stats.not_modified += 1
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+
+        key = f"responses:{user_id}:{version}:{fingerprint}"
+        try:
+            cached = await self.redis.get(key)
+        except RedisError as e:
+            logger.warning(f"Response cache get failed: {e}")
+            cached = None
+        if cached is not None:
+            self.stats.remote_hits += 1
+            entry = orjson.loads(cached)
+            return self._response(entry["body"], {**entry["headers"], "ETag": etag})
+
+        self.stats.misses += 1
+        data = await compute()
+        extra_headers = headers(data) if headers else {}
+        body = serialize(data)
+        response = self._response(body, {**extra_headers, "ETag": etag})
+        entry = {"body": body.decode(), "headers": extra_headers}
+        try:
+            await self.redis.set(key, orjson.dumps(entry), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Response cache set failed: {e}")
+        return response
+
+    @staticmethod
+    def _response(body, headers: Dict[str, str]) -> Response:
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(client, settings.RESPONSE_CACHE_TTL)
+add_write_listener(response_cache.bump)
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
+from typing import Iterator, Optional
+
+from redis.exceptions import RedisError
+
+from src.database.connect import client
+from src.services.base import settings
+from src.services.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+revocation_checks = Counter(
+    "token_revocation_checks_total",
+    "Token revocation checks by how they were answered",
+    ("result",),
+)
+revocation_filter_items = Gauge(
+    "token_revocation_filter_items",
+    "Ids added to this worker's revocation filter since it was last rebuilt",
+)
+
+
+class BloomFilter:
+    """Fixed-size set of strings with no false negatives.
+
+    Sized for `capacity` items at `error_rate` false positives; membership
+    costs one blake2b digest and `hashes` bit probes.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: k probes derived from two 64-bit halves
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList:
+    """Ids (`jti`) of revoked tokens.
+
+    Redis is the source of truth: one `<prefix>:<jti>` key per revoked
+    token, expiring together with the token. Every worker mirrors the ids in
+    a Bloom filter, filled by a SCAN when it subscribes and kept current by
+    ids published on `<prefix>:events`. It is rebuilt after a lost
+    subscription, and every `rebuild_interval` seconds so that expired ids
+    age out. Most tokens are not revoked and the filter says so without a
+    round trip; filter hits, revoked tokens and rare false positives alike,
+    are confirmed in Redis, as is every check while the filter is out of sync.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        capacity: int = 100_000,
+        error_rate: float = 0.001,
+        rebuild_interval: float = 600.0,
+        prefix: str = "revoked",
+    ):
+        self.redis = redis_client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.prefix = prefix
+        self.channel = f"{prefix}:events"
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.synced = False
+        self._task: Optional[asyncio.Task] = None
+
+    def key(self, jti: str) -> str:
+        return f"{self.prefix}:{jti}"
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        """Revoke until `expires_at` (epoch seconds); False if it already was"""
+        ttl = math.ceil(expires_at - time.time())
+        if ttl <= 0:
+            return True
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.key(jti), 1, ex=ttl, nx=True)
+            pipe.publish(self.channel, jti)
+            created, _ = await pipe.execute()
+        self.bloom.add(jti)
+        return bool(created)
+
+    async def is_revoked(self, jti: str) -> bool:
+        if self.synced and jti not in self.bloom:
+            revocation_checks.inc(result="filter")
+            return False
+        try:
+            revoked = bool(await self.redis.exists(self.key(jti)))
+        except RedisError as e:
+            # The filter as last synced is the best answer left
+            logger.warning(f"Failed to check token revocation in Redis: {e}")
+            revocation_checks.inc(result="unavailable")
+            return jti in self.bloom
+        revocation_checks.inc(result="revoked" if revoked else "redis")
+        return revoked
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.synced = False
+
+    async def _sync(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    # Subscribe before the SCAN so no revocation falls between
+                    await pubsub.subscribe(self.channel)
+                    await self._rebuild()
+                    rebuilt = time.monotonic()
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is not None:
+                            self.bloom.add(message["data"])
+                            revocation_filter_items.set(self.bloom.count)
+                        if time.monotonic() - rebuilt > self.rebuild_interval:
+                            await self._rebuild()
+                            rebuilt = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.synced = False
+                logger.warning(f"Token revocation sync lost, retrying: {e}")
+                await asyncio.sleep(1.0)
+
+    async def _rebuild(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        start = len(self.prefix) + 1
+        async for key in self.redis.scan_iter(match=f"{self.prefix}:*", count=1000):
+            bloom.add(key[start:])
+        self.bloom = bloom
+        self.synced = True
+        revocation_filter_items.set(bloom.count)
+        if bloom.count > self.capacity:
+            logger.warning(
+                f"{bloom.count} revoked tokens exceed the filter capacity "
+                f"{self.capacity}; more checks will fall through to Redis"
+            )
+
+
+revocation_list = RevocationList(
+    client,
+    capacity=settings.TOKEN_REVOCATION_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_ERROR_RATE,
+    rebuild_interval=settings.TOKEN_REVOCATION_REBUILD_INTERVAL,
+)
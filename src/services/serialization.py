@@ -0,0 +1,34 @@
+from typing import Any, Callable, Iterable, Sequence
+
+import orjson
+from pydantic import TypeAdapter
+
+# A serializer turns endpoint data into the JSON response body
+Serializer = Callable[[Any], bytes]
+
+
+def dump(data: Any) -> bytes:
+    """orjson encoding of plain data (dicts, lists, dates, ...)"""
+    return orjson.dumps(data)
+
+
+def rows_serializer(fields: Sequence[str]) -> Serializer:
+    """Encode result rows as a list of objects keyed by `fields`.
+
+    For rows selected straight from the database, which were validated on
+    the way in: no per-row model construction or revalidation on the way out.
+    """
+
+    def serialize(rows: Iterable[Sequence[Any]]) -> bytes:
+        return orjson.dumps([dict(zip(fields, row)) for row in rows])
+
+    return serialize
+
+
+def validating_serializer(adapter: TypeAdapter) -> Serializer:
+    """Validate against a schema before encoding, e.g. for ORM objects"""
+
+    def serialize(data: Any) -> bytes:
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+    return serialize
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+
+class FileStorage(ABC):
+    """Where processed avatars are written; keys are relative paths"""
+
+    @abstractmethod
+    async def save(self, key: str, data: bytes, content_type: str) -> str:
+        """Store `data` under `key` and return its public URL.
+
+        Keys are content-addressed, so saving an existing key may keep the
+        stored copy.
+        """
+
+    @abstractmethod
+    def url(self, key: str) -> str: ...
+
+
+class LocalFileStorage(FileStorage):
+    """Files under `root`, served by the app under `base_url`"""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    async def save(self, key: str, data: bytes, content_type: str) -> str:
+        await run_in_threadpool(self._write, self._path(key), data)
+        return self.url(key)
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
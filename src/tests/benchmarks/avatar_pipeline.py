@@ -0,0 +1,120 @@
+"""Avatar pipeline cost and event-loop impact, fully offline.
+
+Runs the UploadFileService against LocalFileStorage in a temporary directory
+with a synthetic photo. While uploads run, a ticker measures how late the
+event loop wakes up, once with the thumbnail computed inline on the loop and
+once in the threadpool as the service does. A final pass that keeps
+re-uploading one image measures the content-hash dedupe path. Prints JSON:
+
+    python -m src.tests.benchmarks.avatar_pipeline --uploads 50
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import tempfile
+import time
+
+import redis.asyncio as redis
+from fastapi import UploadFile
+from PIL import Image
+
+from src.services.cache import TwoTierCache
+from src.services.get_upload import UploadFileService
+from src.services.storage import LocalFileStorage
+from src.tests.benchmarks.common import summarize
+
+
+class InlineUploadFileService(UploadFileService):
+    """The pre-threadpool behaviour: CPU work blocks the event loop"""
+
+    async def upload_file(self, file: UploadFile) -> str:
+        data = await self.read(file)
+        return await self.storage.save(
+            f"inline/{time.perf_counter_ns()}.webp", self.thumbnail(data), ""
+        )
+
+
+def make_photo(width: int, height: int) -> bytes:
+    # A gradient compresses like a photo rather than a flat colour
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.005) -> list:
+    lags = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - t0 - interval, 0.0))
+    return lags
+
+
+def lag_summary(lags: list) -> dict:
+    lags = sorted(lags)
+    return {
+        "p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 2),
+        "max_ms": round(lags[-1] * 1000, 2),
+    }
+
+
+async def run_uploads(service, payloads: list, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def upload(data: bytes):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await service.upload_file(UploadFile(io.BytesIO(data), size=len(data)))
+            samples.append(time.perf_counter() - t0)
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(data) for data in payloads))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return {
+        "uploads": summarize(samples, elapsed),
+        "event_loop_lag": lag_summary(await ticker),
+    }
+
+
+async def run(args) -> dict:
+    photo = make_photo(args.width, args.height)
+    # Unique bytes per upload so every one takes the resize path
+    unique = [photo + i.to_bytes(4, "big") for i in range(args.uploads)]
+    redis_client = redis.from_url(args.redis_url, decode_responses=True)
+    index = TwoTierCache("bench-avatars", redis_client, remote_ttl=60)
+    results = {"photo_bytes": len(photo), "photo_size": [args.width, args.height]}
+    with tempfile.TemporaryDirectory() as root:
+        storage = LocalFileStorage(root, "/media/avatars")
+        inline = InlineUploadFileService(storage, index)
+        results["inline"] = await run_uploads(inline, unique, args.concurrency)
+        service = UploadFileService(storage, index)
+        results["threadpool"] = await run_uploads(service, unique, args.concurrency)
+        # The same bytes again: served from the content-hash index
+        results["deduplicated"] = await run_uploads(
+            service, [unique[0]] * args.uploads, args.concurrency
+        )
+    async for key in redis_client.scan_iter("cache:bench-avatars:*"):
+        await redis_client.delete(key)
+    await redis_client.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
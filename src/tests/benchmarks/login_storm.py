@@ -0,0 +1,83 @@
+"""Latency of unrelated endpoints while /login is flooded.
+
+Measures p50/p95/p99 of a probe endpoint first on an idle server, then while
+`--concurrency` clients hammer /api/users/login, and prints JSON. Run against
+a live server with an existing account:
+
+    python -m src.tests.benchmarks.login_storm --email user@example.com \
+        --password secret --base-url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from src.tests.benchmarks.common import summarize
+
+
+async def probe(client: httpx.AsyncClient, path: str, duration: float) -> dict:
+    samples = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        t0 = time.perf_counter()
+        await client.get(path)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - started)
+
+
+async def login_worker(
+    client: httpx.AsyncClient, email: str, password: str, stop: asyncio.Event
+) -> dict:
+    outcomes = {}
+    while not stop.is_set():
+        response = await client.post(
+            "/api/users/login", data={"username": email, "password": password}
+        )
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+    return outcomes
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=30
+    ) as client:
+        idle = await probe(client, args.probe, args.duration)
+
+        stop = asyncio.Event()
+        workers = [
+            asyncio.create_task(login_worker(client, args.email, args.password, stop))
+            for _ in range(args.concurrency)
+        ]
+        under_storm = await probe(client, args.probe, args.duration)
+        stop.set()
+        logins = {}
+        for outcomes in await asyncio.gather(*workers):
+            for code, count in outcomes.items():
+                logins[code] = logins.get(code, 0) + count
+
+    return {
+        "probe": args.probe,
+        "concurrency": args.concurrency,
+        "idle": idle,
+        "login_storm": under_storm,
+        "login_status_codes": logins,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--probe", default="/api/healthchecker")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Mail delivery throughput against a local aiosmtpd stand-in.
+
+Queues `--messages` verification emails in an isolated Redis queue and
+delivers them twice: once opening a fresh SMTP session per message, as the
+old per-request background task did, and once through the MailDispatcher's
+persistent connections. Prints messages/second and per-message latency as
+JSON:
+
+    python -m src.tests.benchmarks.mail_throughput --messages 2000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import redis.asyncio as redis
+from aiosmtpd.controller import Controller
+
+from src.services.email import render_message
+from src.services.mail_dispatcher import MailDispatcher, SMTPConnection
+from src.services.mail_queue import MailQueue
+from src.tests.benchmarks.common import summarize
+
+
+class CountingHandler:
+    """aiosmtpd handler; runs on the controller's thread and event loop"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = 0
+        self.expected = 0
+        self.done = None
+        self.loop = None
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.received += 1
+        if self.received == self.expected:
+            self.loop.call_soon_threadsafe(self.done.set)
+        return "250 Message accepted for delivery"
+
+    def reset(self, expected: int):
+        self.received = 0
+        self.expected = expected
+        self.done = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+
+
+def make_job(number: int) -> dict:
+    return {
+        "id": str(number),
+        "template": "verification",
+        "to": f"user{number}@example.com",
+        "context": {
+            "host": "http://localhost:8000/api/",
+            "username": f"user{number}@example.com",
+            "token": uuid.uuid4().hex,
+        },
+        "attempts": 0,
+    }
+
+
+async def per_message_connections(args, options: dict) -> dict:
+    """Baseline: a new SMTP session for every message"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    samples = []
+
+    async def send(number: int):
+        async with semaphore:
+            t0 = time.perf_counter()
+            connection = SMTPConnection(**options)
+            await connection.send(render_message(make_job(number)))
+            await connection.close()
+            samples.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(number) for number in range(args.messages)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+async def dispatcher(args, options: dict, handler: CountingHandler) -> dict:
+    redis_client = redis.from_url(args.redis_url, decode_responses=True)
+    prefix = f"bench:mail:{uuid.uuid4().hex[:8]}"
+    queue = MailQueue(redis_client, prefix=prefix)
+    for number in range(args.messages):
+        job = make_job(number)
+        await queue.enqueue(job["template"], job["to"], job["context"])
+
+    worker = MailDispatcher(
+        queue,
+        connections=args.concurrency,
+        batch_size=args.batch_size,
+        name="bench",
+        connection_factory=lambda: SMTPConnection(**options),
+    )
+    stop = asyncio.Event()
+    started = time.perf_counter()
+    task = asyncio.create_task(worker.run(stop))
+    await handler.done.wait()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+    await redis_client.delete(queue.queue_key, queue.retry_key, queue.dead_key)
+    await redis_client.aclose()
+    return {
+        "count": worker.sent,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(worker.sent / elapsed, 1),
+    }
+
+
+async def run(args) -> dict:
+    handler = CountingHandler(args.latency / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    options = {"hostname": "127.0.0.1", "port": args.port, "start_tls": False}
+    try:
+        handler.reset(args.messages)
+        baseline = await per_message_connections(args, options)
+        handler.reset(args.messages)
+        pooled = await dispatcher(args, options, handler)
+    finally:
+        controller.stop()
+    return {
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "batch_size": args.batch_size,
+        "server_latency_ms": args.latency,
+        "connection_per_message": baseline,
+        "dispatcher": pooled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="server delay per message, ms"
+    )
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
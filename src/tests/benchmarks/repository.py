@@ -0,0 +1,155 @@
+"""Repository micro-benchmarks against seeded data, without HTTP in the way.
+
+Calls the repository functions directly with the application's session
+factory for one user created by `src.tests.benchmarks.seed`, and reports
+latency and the number of SQL statements per call (via the profiler).
+Listing is measured on the deepest page both with OFFSET and with a keyset
+cursor. Contacts created by the benchmark are deleted afterwards. Prints JSON:
+
+    python -m src.tests.benchmarks.repository --iterations 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from datetime import date
+
+from sqlalchemy import delete, func, select
+
+from src.database.connect import async_session
+from src.database.models import Contact
+from src.database.profiler import profile_queries
+from src.repository import contacts as repository
+from src.repository.users import get_user_by_email
+from src.schemas.schemas import ContactCreate, ContactUpdate
+from src.tests.benchmarks.common import summarize
+from src.tests.benchmarks.seed import FIRST_NAMES, LAST_NAMES, user_email
+
+
+async def measure(operation, iterations: int) -> dict:
+    """Runs `operation(db, i)` in a fresh session per call, like a request does"""
+    samples, queries = [], []
+    started = time.perf_counter()
+    for i in range(iterations):
+        async with async_session() as db:
+            with profile_queries() as stats:
+                t0 = time.perf_counter()
+                await operation(db, i)
+                samples.append(time.perf_counter() - t0)
+            queries.append(stats.count)
+    result = summarize(samples, time.perf_counter() - started)
+    result["queries_per_call"] = max(queries, default=0)
+    return result
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    async with async_session() as db:
+        user = await get_user_by_email(user_email(args.prefix, args.user), db)
+        if user is None:
+            raise SystemExit("Seeded user not found; run src.tests.benchmarks.seed")
+        total = await db.scalar(
+            select(func.count()).select_from(Contact).filter(Contact.user_id == user.id)
+        )
+        # The cursor of the row just before the deepest page; none when the
+        # deepest page is the first one
+        deep_offset = max(total - args.page_size, 0)
+        deep_cursor = None
+        if deep_offset:
+            before = await repository.get_contacts(db, user, deep_offset - 1, 1)
+            deep_cursor = repository.encode_cursor(before[0]) if before else None
+        contact_ids = [
+            contact.id for contact in await repository.get_contacts(db, user, 0, 200)
+        ]
+
+    names = FIRST_NAMES + LAST_NAMES
+    created = []
+
+    async def list_offset(db, i):
+        await repository.get_contacts(db, user, deep_offset, args.page_size)
+
+    async def list_cursor(db, i):
+        await repository.get_contacts(
+            db, user, limit=args.page_size, cursor=deep_cursor
+        )
+
+    async def search(db, i):
+        name = rng.choice(names)
+        await repository.search_contacts(db, name[:4], user, limit=args.page_size)
+
+    async def search_fuzzy(db, i):
+        # A one-letter typo, as a user would make it
+        name = rng.choice(names)
+        position = rng.randrange(1, len(name))
+        typo = name[:position] + "x" + name[position + 1 :]
+        await repository.search_contacts(
+            db, typo, user, limit=args.page_size, fuzzy=True
+        )
+
+    async def birthdays(db, i):
+        await repository.get_upcoming_birthdays(db, user, days=30)
+
+    async def create(db, i):
+        contact = ContactCreate(
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            email=f"repository-bench-{i}@example.com",
+            phone_number=f"+380{rng.randrange(10**9):09d}",
+            birthday=date(1990, 1, 1),
+        )
+        created.append((await repository.create_contact(db, contact, user)).id)
+
+    async def update(db, i):
+        values = ContactUpdate(phone_number=f"+380{rng.randrange(10**9):09d}")
+        await repository.update_contact(db, rng.choice(contact_ids), values, user)
+
+    operations = {
+        "list_offset": list_offset,
+        "list_cursor": list_cursor,
+        "search": search,
+        "search_fuzzy": search_fuzzy,
+        "birthdays": birthdays,
+        "create": create,
+        "update": update,
+    }
+    results = {}
+    try:
+        for name, operation in operations.items():
+            if args.operation and name not in args.operation:
+                continue
+            try:
+                results[name] = await measure(operation, args.iterations)
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"[:300]}
+    finally:
+        if created:
+            async with async_session() as db:
+                await db.execute(delete(Contact).where(Contact.id.in_(created)))
+                await db.commit()
+
+    return {
+        "user": user.email,
+        "contacts": total,
+        "page_size": args.page_size,
+        "deep_offset": deep_offset,
+        "iterations": args.iterations,
+        "operations": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--user", type=int, default=0, help="seeded user number")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--operation", action="append", help="repeatable")
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Repeatable HTTP load scenarios against a live server.
+
+Logs in as users created by `src.tests.benchmarks.seed` and runs each
+scenario for `--duration` seconds with `--concurrency` clients, reporting
+throughput, latency percentiles, status codes and the SQL query count and
+DB time taken from each response's `Server-Timing` header, as JSON:
+
+    python -m src.tests.benchmarks.scenarios --users 10 --duration 10 \
+        --scenario list --scenario search
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+
+from datetime import date, timedelta
+
+import httpx
+
+from src.tests.benchmarks.common import summarize
+from src.tests.benchmarks.seed import FIRST_NAMES, LAST_NAMES, user_email
+
+CONTACTS = "/api/contacts/contacts"
+SERVER_TIMING = re.compile(r'db;desc="(\d+) queries";dur=([\d.]+)')
+
+
+class VirtualUser:
+    """One client session: a seeded account, its token and scenario state"""
+
+    def __init__(self, email: str, password: str, rng: random.Random):
+        self.email = email
+        self.password = password
+        self.rng = rng
+        self.headers = {}
+        self.contact_ids = []
+        self.cursor = None
+
+    async def login(self, client: httpx.AsyncClient) -> httpx.Response:
+        response = await client.post(
+            "/api/users/login",
+            data={"username": self.email, "password": self.password},
+        )
+        if response.status_code == 200:
+            token = response.json()["access_token"]
+            self.headers = {"Authorization": f"Bearer {token}"}
+        return response
+
+    async def prepare(self, client: httpx.AsyncClient):
+        response = await self.login(client)
+        response.raise_for_status()
+        page = await client.get(f"{CONTACTS}/?limit=100", headers=self.headers)
+        self.contact_ids = [contact["id"] for contact in page.json()]
+
+    def random_contact(self) -> dict:
+        first = self.rng.choice(FIRST_NAMES)
+        last = self.rng.choice(LAST_NAMES)
+        birthday = date.today() - timedelta(days=self.rng.randrange(18 * 365, 80 * 365))
+        return {
+            "first_name": first,
+            "last_name": last,
+            "email": f"{first}.{last}{self.rng.randrange(10**6)}@example.com".lower(),
+            "phone_number": f"+380{self.rng.randrange(10**9):09d}",
+            "birthday": birthday.isoformat(),
+        }
+
+
+async def scenario_login(client, user: VirtualUser):
+    return await user.login(client)
+
+
+async def scenario_list(client, user: VirtualUser):
+    """Walks the contact list page by page with keyset cursors"""
+    params = {"limit": 20}
+    if user.cursor:
+        params["cursor"] = user.cursor
+    response = await client.get(f"{CONTACTS}/", params=params, headers=user.headers)
+    user.cursor = response.headers.get("x-next-cursor")
+    return response
+
+
+async def scenario_search(client, user: VirtualUser):
+    name = user.rng.choice(FIRST_NAMES + LAST_NAMES)
+    start = user.rng.randrange(max(1, len(name) - 3))
+    return await client.get(
+        f"{CONTACTS}/search/",
+        params={"query": name[start : start + 4], "limit": 20},
+        headers=user.headers,
+    )
+
+
+async def scenario_birthdays(client, user: VirtualUser):
+    return await client.get(
+        f"{CONTACTS}/birthdays/",
+        params={"days": user.rng.choice([7, 14, 30])},
+        headers=user.headers,
+    )
+
+
+async def scenario_create(client, user: VirtualUser):
+    response = await client.post(
+        f"{CONTACTS}/", json=user.random_contact(), headers=user.headers
+    )
+    if response.status_code == 201:
+        user.contact_ids.append(response.json()["id"])
+    return response
+
+
+async def scenario_update(client, user: VirtualUser):
+    contact_id = user.rng.choice(user.contact_ids)
+    return await client.put(
+        f"{CONTACTS}/{contact_id}",
+        json={"phone_number": f"+380{user.rng.randrange(10**9):09d}"},
+        headers=user.headers,
+    )
+
+
+SCENARIOS = {
+    "login": scenario_login,
+    "list": scenario_list,
+    "search": scenario_search,
+    "birthdays": scenario_birthdays,
+    "create": scenario_create,
+    "update": scenario_update,
+}
+
+
+async def run_scenario(client, users, scenario, duration: float) -> dict:
+    samples, queries, db_ms, statuses = [], [], [], {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(user: VirtualUser):
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            response = await scenario(client, user)
+            samples.append(time.perf_counter() - t0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            timing = SERVER_TIMING.search(response.headers.get("server-timing", ""))
+            if timing:
+                queries.append(int(timing.group(1)))
+                db_ms.append(float(timing.group(2)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(user) for user in users))
+    result = summarize(samples, time.perf_counter() - started)
+    result["status_codes"] = statuses
+    if queries:
+        result["queries_per_request"] = {
+            "mean": round(statistics.fmean(queries), 2),
+            "max": max(queries),
+        }
+        result["db_mean_ms"] = round(statistics.fmean(db_ms), 2)
+    return result
+
+
+async def run(args) -> dict:
+    names = args.scenario or list(SCENARIOS)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=30
+    ) as client:
+        users = [
+            VirtualUser(
+                user_email(args.prefix, number % args.users),
+                args.password,
+                random.Random(args.seed + number),
+            )
+            for number in range(args.concurrency)
+        ]
+        await asyncio.gather(*(user.prepare(client) for user in users))
+        results = {}
+        for name in names:
+            results[name] = await run_scenario(
+                client, users, SCENARIOS[name], args.duration
+            )
+
+    return {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--password", default="benchmark")
+    parser.add_argument("--users", type=int, default=10, help="seeded users to use")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--scenario", action="append", choices=list(SCENARIOS), help="repeatable"
+    )
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
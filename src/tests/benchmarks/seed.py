@@ -0,0 +1,170 @@
+"""Synthetic users and contacts for benchmarks, loaded with COPY.
+
+Creates `--users` accounts named `<prefix>-000000@example.com`, ... sharing
+one password, each with `--contacts` contacts drawn from realistic name
+lists and an age-shaped birthday distribution. The same `--seed` always
+produces the same data. Prints a JSON summary:
+
+    python -m src.tests.benchmarks.seed --users 100 --contacts 1000 --reset
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from datetime import date, timedelta
+
+import asyncpg
+
+from src.services.auth import Auth
+from src.services.base import settings
+
+FIRST_NAMES = [
+    "Olena", "Andrii", "Iryna", "Oleksandr", "Natalia", "Dmytro", "Tetiana",
+    "Serhii", "Yulia", "Mykola", "Oksana", "Volodymyr", "Kateryna", "Taras",
+    "Svitlana", "Bohdan", "Anna", "Yurii", "Maria", "Ivan", "Sofia", "Maksym",
+    "Viktoria", "Roman", "Daria", "Artem", "Alina", "Pavlo", "Khrystyna", "Denys",
+    "Emma", "Liam", "Olivia", "Noah", "Ava", "Lucas", "Mia", "Leo", "Chloe",
+    "Hugo", "Laura", "Mateo", "Elena", "Jakub", "Zofia", "Tomas", "Ingrid",
+    "Lars", "Aiko", "Kenji", "Priya", "Arjun", "Fatima", "Omar", "Nadia",
+    "Carlos", "Lucia", "Marco", "Giulia", "Pierre",
+]  # fmt: skip
+
+LAST_NAMES = [
+    "Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko",
+    "Boiko", "Melnyk", "Oliinyk", "Koval", "Moroz", "Lysenko", "Marchenko",
+    "Savchenko", "Rudenko", "Petrenko", "Klymenko", "Pavlenko", "Levchenko",
+    "Honcharenko", "Zhuk", "Smith", "Johnson", "Brown", "Garcia", "Miller",
+    "Davis", "Martinez", "Wilson", "Anderson", "Taylor", "Muller", "Schmidt",
+    "Schneider", "Fischer", "Rossi", "Russo", "Dubois", "Moreau", "Nowak",
+    "Kowalski", "Wisniewski", "Novak", "Svoboda", "Jensen", "Nielsen",
+    "Tanaka", "Suzuki", "Sato", "Kumar", "Singh", "Haddad", "Rahman",
+    "Fernandez", "Lopez", "Silva", "Santos", "Ivanova", "Horvat", "Popescu",
+    "O'Brien",
+]  # fmt: skip
+
+DOMAINS = ["gmail.com", "ukr.net", "outlook.com", "example.com", "proton.me"]
+NOTES = [None, None, None, "Work", "Family", "Met at a conference", "Neighbour"]
+
+USER_COLUMNS = ["id", "email", "hashed_password", "is_verified"]
+CONTACT_COLUMNS = [
+    "first_name",
+    "last_name",
+    "email",
+    "phone_number",
+    "birthday",
+    "additional_data",
+    "user_id",
+]
+
+
+def user_email(prefix: str, number: int) -> str:
+    return f"{prefix}-{number:06d}@example.com"
+
+
+def random_birthday(rng: random.Random, today: date) -> date:
+    # Ages skew towards 25-45 like a typical address book, capped at 18-90
+    age = rng.triangular(18, 90, 32)
+    return today - timedelta(days=int(age * 365.25) + rng.randrange(365))
+
+
+def contact_records(rng: random.Random, user_ids, per_user: int, today: date):
+    for user_id in user_ids:
+        for number in range(per_user):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            local = f"{first}.{last}".lower().replace("'", "")
+            yield (
+                first,
+                last,
+                f"{local}{number}@{rng.choice(DOMAINS)}",
+                f"+380{rng.randrange(10**9):09d}",
+                random_birthday(rng, today),
+                rng.choice(NOTES),
+                user_id,
+            )
+
+
+async def reset(conn: asyncpg.Connection, prefix: str):
+    pattern = f"{prefix}-%@example.com"
+    await conn.execute(
+        "DELETE FROM contacts USING users "
+        "WHERE contacts.user_id = users.id AND users.email LIKE $1",
+        pattern,
+    )
+    await conn.execute("DELETE FROM users WHERE email LIKE $1", pattern)
+
+
+async def seed(args) -> dict:
+    rng = random.Random(args.seed)
+    dsn = (args.database_url or settings.DATABASE_URL).replace("+asyncpg", "")
+    conn = await asyncpg.connect(dsn)
+    started = time.perf_counter()
+    try:
+        if args.reset:
+            await reset(conn, args.prefix)
+        # One hash for everyone: bcrypt would otherwise dominate seeding time
+        hashed_password = Auth.pwd_context.hash(args.password)
+        async with conn.transaction():
+            user_ids = [
+                row[0]
+                for row in await conn.fetch(
+                    "SELECT nextval(pg_get_serial_sequence('users', 'id')) "
+                    "FROM generate_series(1, $1)",
+                    args.users,
+                )
+            ]
+            await conn.copy_records_to_table(
+                "users",
+                columns=USER_COLUMNS,
+                records=[
+                    (user_id, user_email(args.prefix, number), hashed_password, True)
+                    for number, user_id in enumerate(user_ids)
+                ],
+            )
+            users_done = time.perf_counter()
+            await conn.copy_records_to_table(
+                "contacts",
+                columns=CONTACT_COLUMNS,
+                records=contact_records(rng, user_ids, args.contacts, date.today()),
+            )
+        contacts_done = time.perf_counter()
+        # Fresh planner statistics so benchmarks see realistic plans
+        await conn.execute("ANALYZE users")
+        await conn.execute("ANALYZE contacts")
+    finally:
+        await conn.close()
+
+    total_contacts = args.users * args.contacts
+    contacts_elapsed = contacts_done - users_done
+    return {
+        "prefix": args.prefix,
+        "password": args.password,
+        "users": args.users,
+        "contacts": total_contacts,
+        "first_user": user_email(args.prefix, 0),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "contacts_per_second": (
+            round(total_contacts / contacts_elapsed, 1) if contacts_elapsed else 0.0
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=1000, help="per user")
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--password", default="benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--reset", action="store_true", help="delete earlier data with this prefix"
+    )
+    print(json.dumps(asyncio.run(seed(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Contact list serialization: ORM + pydantic versus rows + orjson.
+
+Loads `--page-size` contacts of a user created by `src.tests.benchmarks.seed`
+both ways and times the query and the JSON encoding separately. The ORM path
+is the previous implementation: full `Contact` objects validated into
+`ContactResponse` with `from_attributes` and dumped by pydantic. The row
+path is the current one. Also checks that both produce the same bytes.
+Prints JSON:
+
+    python -m src.tests.benchmarks.serialization --page-size 1000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from src.database.connect import async_session
+from src.database.models import Contact
+from src.repository.contacts import CONTACT_FIELDS, get_contacts
+from src.repository.users import get_user_by_email
+from src.schemas.schemas import ContactResponse
+from src.services.serialization import rows_serializer
+from src.tests.benchmarks.common import summarize
+from src.tests.benchmarks.seed import user_email
+
+contact_list_adapter = TypeAdapter(List[ContactResponse])
+serialize_rows = rows_serializer(CONTACT_FIELDS)
+
+
+async def load_orm(db, user, limit: int):
+    result = await db.execute(
+        select(Contact)
+        .filter(Contact.user_id == user.id)
+        .order_by(Contact.last_name, Contact.id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+def serialize_orm(contacts) -> bytes:
+    validated = contact_list_adapter.validate_python(contacts, from_attributes=True)
+    return contact_list_adapter.dump_json(validated)
+
+
+async def measure(load, serialize, user, args) -> dict:
+    query, encode, total = [], [], []
+    for _ in range(args.iterations):
+        async with async_session() as db:
+            t0 = time.perf_counter()
+            data = await load(db, user, args.page_size)
+            t1 = time.perf_counter()
+            body = serialize(data)
+            t2 = time.perf_counter()
+        query.append(t1 - t0)
+        encode.append(t2 - t1)
+        total.append(t2 - t0)
+    return {
+        "query": summarize(query, sum(query)),
+        "serialize": summarize(encode, sum(encode)),
+        "total": summarize(total, sum(total)),
+        "body_bytes": len(body),
+    }
+
+
+async def run(args) -> dict:
+    async with async_session() as db:
+        user = await get_user_by_email(user_email(args.prefix, args.user), db)
+        if user is None:
+            raise SystemExit("Seeded user not found; run src.tests.benchmarks.seed")
+        identical = serialize_orm(
+            await load_orm(db, user, args.page_size)
+        ) == serialize_rows(await get_contacts(db, user, limit=args.page_size))
+
+    async def load_rows(db, user, limit):
+        return await get_contacts(db, user, limit=limit)
+
+    orm = await measure(load_orm, serialize_orm, user, args)
+    rows = await measure(load_rows, serialize_rows, user, args)
+    return {
+        "page_size": args.page_size,
+        "iterations": args.iterations,
+        "identical_output": identical,
+        "orm_pydantic": orm,
+        "rows_orjson": rows,
+        "speedup": {
+            part: round(orm[part]["mean_ms"] / rows[part]["mean_ms"], 2)
+            for part in ("query", "serialize", "total")
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--user", type=int, default=0, help="seeded user number")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
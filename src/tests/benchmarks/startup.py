@@ -0,0 +1,142 @@
+"""Worker cold-start cost: import time, time to accept, first request.
+
+Each run starts a fresh interpreter. Import runs time `import src.main`; boot
+runs start uvicorn on a free port, wait for it to accept connections, then
+time the first (cold pool, cold caches) and second requests to `--path`.
+Also lists the imports with the highest self time. Needs the same
+environment as the app (DATABASE_URL, Redis, ...). Prints JSON:
+
+    python -m src.tests.benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import src.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list:
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append((int(self_us), int(cumulative_us), name.strip()))
+    modules.sort(reverse=True)
+    return [
+        {"module": name, "self_ms": self_us / 1000, "cumulative_ms": total_us / 1000}
+        for self_us, total_us, name in modules[:top]
+    ]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError("uvicorn did not start accepting connections")
+
+
+def measure_boot(path: str) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=os.environ.copy(),
+    )
+    try:
+        wait_for_port(port, process)
+        ready = time.perf_counter() - started
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            latencies = []
+            for _ in range(2):
+                t0 = time.perf_counter()
+                client.get(path).raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+        return {
+            "ready": ready,
+            "first_request": latencies[0],
+            "second_request": latencies[1],
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def milliseconds(samples: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/healthchecker")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    boots = [measure_boot(args.path) for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "import_src_main": milliseconds(imports),
+        "ready_to_accept": milliseconds([boot["ready"] for boot in boots]),
+        "first_request": milliseconds([boot["first_request"] for boot in boots]),
+        "second_request": milliseconds([boot["second_request"] for boot in boots]),
+        "slowest_imports": slowest_imports(args.top),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Birthday window tests for the upcoming birthdays reads.
+
+Creates one verified user with a contact per interesting birthday in the
+database at DATABASE_URL, which must be migrated to head, and checks which
+of them `get_upcoming_birthdays` and `stream_upcoming_birthdays` return.
+Skipped when the database cannot be reached.
+
+    pytest -c src/pytest.ini src/tests/test_birthdays.py
+"""
+
+import asyncio
+
+from datetime import date
+from typing import Dict, List
+
+import pytest
+
+from sqlalchemy import delete, select
+
+from src.database.connect import async_session, engine
+from src.database.models import Contact, User
+from src.repository.contacts import get_upcoming_birthdays, stream_upcoming_birthdays
+
+EMAIL = "birthday-window@example.com"
+BIRTHDAYS = {
+    "new_year": date(1990, 1, 1),
+    "leap_day": date(1992, 2, 29),
+    "mar_1": date(1985, 3, 1),
+    "mid_year": date(1988, 7, 15),
+    "dec_30": date(1979, 12, 30),
+    "dec_31": date(1995, 12, 31),
+}
+# (start, days) -> birthdays in the window, in the order they come up
+WINDOWS = {
+    (date(2024, 12, 31), 366): [
+        "dec_31", "new_year", "leap_day", "mar_1", "mid_year", "dec_30",
+    ],
+    (date(2025, 6, 1), 365): [
+        "mid_year", "dec_30", "dec_31", "new_year", "leap_day", "mar_1",
+    ],
+    (date(2025, 12, 30), 3): ["dec_30", "dec_31", "new_year"],
+    # Feb 29 birthdays fall on Mar 1 in common years
+    (date(2025, 3, 1), 7): ["leap_day", "mar_1"],
+    (date(2025, 2, 20), 8): [],
+    (date(2025, 2, 20), 9): ["leap_day", "mar_1"],
+    (date(2024, 2, 29), 1): ["leap_day", "mar_1"],
+    (date(2024, 3, 1), 7): ["mar_1"],
+    (date(2025, 12, 1), 89): ["dec_30", "dec_31", "new_year"],
+    (date(2025, 12, 1), 90): ["dec_30", "dec_31", "new_year", "leap_day", "mar_1"],
+}  # fmt: skip
+
+
+async def upcoming(user: User, start: date, days: int) -> Dict[str, List[int]]:
+    async with async_session() as db:
+        listed = await get_upcoming_birthdays(db, user, days, start_date=start)
+        streamed = [
+            row.id
+            async for row in stream_upcoming_birthdays(
+                db, start, days, after_user_id=user.id - 1
+            )
+            if row.user_id == user.id
+        ]
+    return {"listed": [row["id"] for row in listed], "streamed": streamed}
+
+
+async def collect() -> Dict[tuple, Dict[str, List[str]]]:
+    async with async_session() as db:
+        # Left over by an interrupted run
+        stale = select(User.id).filter(User.email == EMAIL).scalar_subquery()
+        await db.execute(delete(Contact).filter(Contact.user_id == stale))
+        await db.execute(delete(User).filter(User.email == EMAIL))
+        user = User(email=EMAIL, hashed_password="-", is_verified=True)
+        db.add(user)
+        await db.flush()
+        contacts = {
+            name: Contact(
+                first_name=name,
+                last_name="Window",
+                email=f"{name}@example.com",
+                phone_number="+380000000000",
+                birthday=birthday,
+                user_id=user.id,
+            )
+            for name, birthday in BIRTHDAYS.items()
+        }
+        db.add_all(contacts.values())
+        await db.commit()
+        names = {contact.id: name for name, contact in contacts.items()}
+
+    results = {}
+    try:
+        for start, days in WINDOWS:
+            ids = await upcoming(user, start, days)
+            results[start, days] = {
+                source: [names[i] for i in found] for source, found in ids.items()
+            }
+    finally:
+        async with async_session() as db:
+            await db.execute(delete(Contact).filter(Contact.user_id == user.id))
+            await db.execute(delete(User).filter(User.id == user.id))
+            await db.commit()
+        await engine.dispose()
+    return results
+
+
+@pytest.fixture(scope="module")
+def results():
+    try:
+        return asyncio.run(collect())
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"Database unavailable: {e}")
+
+
+@pytest.mark.parametrize("window", WINDOWS, ids=lambda w: f"{w[0]}+{w[1]}")
+def test_birthday_window(results, window):
+    expected = WINDOWS[window]
+    assert results[window]["listed"] == expected
+    assert results[window]["streamed"] == expected
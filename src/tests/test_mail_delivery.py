@@ -0,0 +1,245 @@
+"""Mail delivery tests against a local aiosmtpd stand-in.
+
+Runs the MailDispatcher on an isolated queue in the application's Redis and
+checks delivery, retry with backoff, dead-lettering after the last attempt,
+recovery of jobs held by a dispatcher that is gone, and the reconnect after
+the server dropped an idle SMTP session. Skipped when Redis cannot be
+reached.
+
+    pytest -c src/pytest.ini src/tests/test_mail_delivery.py
+"""
+
+import asyncio
+import json
+import socket
+import time
+import uuid
+
+from contextlib import asynccontextmanager
+from typing import List
+
+import pytest
+import redis.asyncio as redis
+
+from aiosmtpd.controller import Controller
+from redis.exceptions import RedisError
+
+from src.database.connect import client
+from src.services.email import render_message
+from src.services.mail_dispatcher import MailDispatcher, SMTPConnection
+from src.services.mail_queue import MailQueue
+
+WAIT_TIMEOUT = 10.0
+
+
+class RecordingHandler:
+    """aiosmtpd handler; answers with the queued `replies` first, then 250.
+
+    With `drop_session` set, the next MAIL command closes the connection
+    instead, as a server dropping an idle session does. Runs on the
+    controller's thread, so it only appends to lists and flips flags.
+    """
+
+    def __init__(self):
+        self.replies: List[str] = []
+        self.attempts: List[tuple] = []
+        self.drop_session = False
+
+    async def handle_MAIL(self, server, session, envelope, address, options):
+        if self.drop_session:
+            self.drop_session = False
+            server.transport.close()
+            return "421 Closing connection"
+        envelope.mail_from = address
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.attempts.append((time.monotonic(), envelope.rcpt_tos[0]))
+        if self.replies:
+            return self.replies.pop(0)
+        return "250 Message accepted for delivery"
+
+
+@pytest.fixture
+def smtp():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        yield handler, {"hostname": "127.0.0.1", "port": port, "start_tls": False}
+    finally:
+        controller.stop()
+
+
+@asynccontextmanager
+async def isolated_queue(**options):
+    """A MailQueue under a random prefix, deleted afterwards"""
+    kwargs = client.connection_pool.connection_kwargs
+    redis_client = redis.Redis(
+        host=kwargs["host"], port=kwargs["port"], decode_responses=True
+    )
+    try:
+        await redis_client.ping()
+    except (RedisError, OSError) as e:
+        await redis_client.aclose()
+        pytest.skip(f"Redis unavailable: {e}")
+    queue = MailQueue(redis_client, prefix=f"test:mail:{uuid.uuid4().hex}", **options)
+    try:
+        yield queue
+    finally:
+        keys = [key async for key in redis_client.scan_iter(match=f"{queue.prefix}:*")]
+        if keys:
+            await redis_client.delete(*keys)
+        await redis_client.aclose()
+
+
+@asynccontextmanager
+async def running(queue: MailQueue, options: dict, name: str = "test"):
+    dispatcher = MailDispatcher(
+        queue,
+        connections=1,
+        name=name,
+        connection_factory=lambda: SMTPConnection(**options),
+    )
+    stop = asyncio.Event()
+    task = asyncio.create_task(dispatcher.run(stop))
+    try:
+        yield dispatcher
+    finally:
+        stop.set()
+        await task
+
+
+async def wait_for(condition):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while not await condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the mail dispatcher")
+        await asyncio.sleep(0.05)
+
+
+async def enqueue(queue: MailQueue, *recipients: str):
+    for to in recipients:
+        await queue.enqueue(
+            "verification", to, {"host": "http://test/", "username": to, "token": "t"}
+        )
+
+
+async def delivered(dispatcher: MailDispatcher, count: int) -> bool:
+    return dispatcher.sent == count
+
+
+def test_delivered(smtp):
+    handler, options = smtp
+
+    async def scenario():
+        async with isolated_queue() as queue:
+            await enqueue(queue, "a@example.com", "b@example.com")
+            async with running(queue, options) as dispatcher:
+                await wait_for(lambda: delivered(dispatcher, 2))
+            return dispatcher.sent, await queue.stats()
+
+    sent, stats = asyncio.run(scenario())
+    assert sent == 2
+    assert stats == {"queued": 0, "retrying": 0, "dead": 0}
+    assert sorted(to for _, to in handler.attempts) == [
+        "a@example.com",
+        "b@example.com",
+    ]
+
+
+def test_retried_with_backoff(smtp):
+    handler, options = smtp
+    handler.replies = ["451 Try again later"]
+
+    async def scenario():
+        async with isolated_queue(backoff=0.5) as queue:
+            await enqueue(queue, "a@example.com")
+            async with running(queue, options) as dispatcher:
+                await wait_for(lambda: delivered(dispatcher, 1))
+            return dispatcher, await queue.stats()
+
+    dispatcher, stats = asyncio.run(scenario())
+    assert (dispatcher.failed, dispatcher.sent) == (1, 1)
+    assert stats == {"queued": 0, "retrying": 0, "dead": 0}
+    (first, _), (second, _) = handler.attempts
+    assert second - first >= 0.5
+
+
+@pytest.mark.parametrize(
+    "replies, attempts",
+    [(["451 Try again later"] * 3, 3), (["550 No such user"], 1)],
+    ids=["transient", "permanent"],
+)
+def test_dead_lettered(smtp, replies, attempts):
+    handler, options = smtp
+    handler.replies = list(replies)
+
+    async def scenario():
+        async with isolated_queue(max_attempts=3, backoff=0.05) as queue:
+            await enqueue(queue, "a@example.com")
+            async with running(queue, options):
+
+                async def buried():
+                    return (await queue.stats())["dead"] == 1
+
+                await wait_for(buried)
+            return json.loads(await queue.redis.lindex(queue.dead_key, 0))
+
+    job = asyncio.run(scenario())
+    assert len(handler.attempts) == attempts
+    assert job["attempts"] == attempts
+    assert replies[-1].split(" ", 1)[1] in job["error"]
+
+
+def test_orphaned_job_recovered(smtp):
+    handler, options = smtp
+
+    async def scenario():
+        async with isolated_queue() as queue:
+            await enqueue(queue, "orphan@example.com", "busy@example.com")
+            # One job held by a dispatcher that is gone, one by a live one
+            await queue.claim("gone:0", 1, 1.0)
+            await queue.heartbeat("busy", 30)
+            await queue.claim("busy:0", 1, 1.0)
+            async with running(queue, options):
+
+                async def recovered():
+                    return len(handler.attempts) == 1
+
+                await wait_for(recovered)
+            return (
+                await queue.redis.llen(queue.processing_key("gone:0")),
+                await queue.redis.llen(queue.processing_key("busy:0")),
+            )
+
+    gone, busy = asyncio.run(scenario())
+    assert [to for _, to in handler.attempts] == ["orphan@example.com"]
+    assert (gone, busy) == (0, 1)
+
+
+def test_reconnects_once_after_server_dropped_session(smtp):
+    handler, options = smtp
+    job = {
+        "template": "verification",
+        "to": "a@example.com",
+        "context": {"host": "http://test/", "username": "a", "token": "t"},
+    }
+
+    async def scenario():
+        connection = SMTPConnection(**options)
+        try:
+            await connection.connect()
+            dropped = connection.smtp
+            # Still looks connected; the send finds out and retries
+            handler.drop_session = True
+            await connection.send(render_message(job))
+            return dropped is not connection.smtp
+        finally:
+            await connection.close()
+
+    assert asyncio.run(scenario())
+    assert [to for _, to in handler.attempts] == ["a@example.com"]
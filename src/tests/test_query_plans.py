@@ -0,0 +1,188 @@
+"""Query plan regression tests for the repository reads.
+
+Seeds a realistic dataset (many small address books and a few large ones)
+into the database at DATABASE_URL, which must be migrated to head, runs each
+repository query there and checks the plan of every statement it issued from
+`EXPLAIN (ANALYZE, FORMAT JSON)`: no sequential scan over `contacts` or
+`users`, and a total cost within the query's budget. The dataset is removed
+again afterwards. Skipped when the database cannot be reached.
+
+    pytest -c src/pytest.ini src/tests/test_query_plans.py
+"""
+
+import asyncio
+import contextlib
+import json
+
+from argparse import Namespace
+from datetime import date
+from typing import Dict, List
+
+import asyncpg
+import pytest
+
+from sqlalchemy import event, select, text
+
+from src.database.connect import async_session, engine
+from src.database.models import User
+from src.repository.contacts import (
+    encode_cursor,
+    get_contact,
+    get_contacts,
+    get_upcoming_birthdays,
+    search_contacts,
+)
+from src.repository.users import get_user_by_email
+from src.services.base import settings
+from src.tests.benchmarks.seed import reset, seed, user_email
+
+PREFIX = "plans"
+# (prefix suffix, users, contacts per user)
+DATASETS = {"typical": ("", 2000, 50), "large": ("-large", 5, 5000)}
+SCANNED_TABLES = {"contacts", "users"}
+
+# Planner cost ceiling per query and dataset, a few times today's cost. A
+# query that loses its index falls back to another index or a scan that costs
+# several times more for a typical user and tens of times more for a large one.
+CASES: Dict[str, Dict[str, float]] = {
+    "get_contacts": {"typical": 60, "large": 60},
+    "get_contacts_cursor": {"typical": 60, "large": 60},
+    "get_contact": {"typical": 20, "large": 20},
+    "search_contacts": {"typical": 1000, "large": 5000},
+    "search_contacts_fuzzy": {"typical": 2000, "large": 10000},
+    # Every birthday in the window is returned, so cost grows with the book
+    "get_upcoming_birthdays": {"typical": 50, "large": 1000},
+    "get_upcoming_birthdays_new_year": {"typical": 60, "large": 1500},
+    "get_user_by_email": {"typical": 20, "large": 20},
+}
+
+
+def walk(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from walk(child)
+
+
+async def explain(statements) -> List[dict]:
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, FORMAT JSON) {statement}", parameters
+            )
+            raw = result.scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+            plans.append({"statement": statement, **plan})
+        await conn.rollback()
+    return plans
+
+
+async def capture(call) -> List[dict]:
+    """Plans of the SELECTs issued by `call`"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        async with async_session() as db:
+            await call(db)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    return await explain(statements)
+
+
+async def collect_plans() -> Dict[str, Dict[str, List[dict]]]:
+    for suffix, users, contacts in DATASETS.values():
+        await seed(
+            Namespace(
+                database_url=None,
+                users=users,
+                contacts=contacts,
+                prefix=PREFIX + suffix,
+                password="plans",
+                seed=7,
+                reset=True,
+            )
+        )
+    async with async_session() as db:
+        trigram = await db.scalar(
+            text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'")
+        )
+
+    plans: Dict[str, Dict[str, List[dict]]] = {}
+    for name, (suffix, _, _) in DATASETS.items():
+        email = user_email(PREFIX + suffix, 1)
+        async with async_session() as db:
+            user = await db.scalar(select(User).filter(User.email == email))
+            page = await get_contacts(db, user, limit=10)
+        cursor = encode_cursor(page[-1])
+        new_year = date(date.today().year, 12, 28)
+        calls = {
+            "get_contacts": lambda db: get_contacts(db, user, limit=10),
+            "get_contacts_cursor": lambda db: get_contacts(
+                db, user, limit=10, cursor=cursor
+            ),
+            "get_contact": lambda db: get_contact(db, page[0].id, user),
+            "get_upcoming_birthdays": lambda db: get_upcoming_birthdays(db, user, 7),
+            "get_upcoming_birthdays_new_year": lambda db: get_upcoming_birthdays(
+                db, user, 7, start_date=new_year
+            ),
+            "get_user_by_email": lambda db: get_user_by_email(email, db),
+        }
+        if trigram:
+            calls["search_contacts"] = lambda db: search_contacts(db, "olen", user)
+            calls["search_contacts_fuzzy"] = lambda db: search_contacts(
+                db, "olena", user, fuzzy=True
+            )
+        plans[name] = {case: await capture(call) for case, call in calls.items()}
+    await engine.dispose()
+    return plans
+
+
+async def remove_datasets():
+    conn = await asyncpg.connect(settings.DATABASE_URL.replace("+asyncpg", ""))
+    try:
+        for suffix, _, _ in DATASETS.values():
+            await reset(conn, PREFIX + suffix)
+    finally:
+        await conn.close()
+
+
+@pytest.fixture(scope="module")
+def plans():
+    try:
+        yield asyncio.run(collect_plans())
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"Database unavailable: {e}")
+    finally:
+        with contextlib.suppress(OSError, ConnectionError):
+            asyncio.run(remove_datasets())
+
+
+@pytest.mark.parametrize("dataset", DATASETS)
+@pytest.mark.parametrize("case", CASES)
+def test_query_plan(plans, dataset, case):
+    if case not in plans[dataset]:
+        pytest.skip("pg_trgm is not installed")
+    captured = plans[dataset][case]
+    assert captured, f"{case} issued no SELECT"
+    for plan in captured:
+        nodes = list(walk(plan["Plan"]))
+        seq_scans = [
+            node["Relation Name"]
+            for node in nodes
+            if node["Node Type"] == "Seq Scan"
+            and node["Relation Name"] in SCANNED_TABLES
+        ]
+        assert not seq_scans, (
+            f"{case} scans {', '.join(seq_scans)} sequentially:\n"
+            f"{plan['statement']}"
+        )
+        cost, budget = plan["Plan"]["Total Cost"], CASES[case][dataset]
+        assert cost <= budget, (
+            f"{case} costs {cost:.0f}, budget {budget:.0f} "
+            f"({plan['Execution Time']:.1f} ms):\n{plan['statement']}"
+        )
@@ -1,12 +1,7 @@
-from redis_lru import RedisLRU
-import redis
+from src.services.cache import cached
 
 
-client = redis.StrictRedis(host="redis", port=6379, decode_responses=True)
-cache = RedisLRU(client)
-
-
-@cache
-def compute_value(x):
+@cached(ttl=3600)
+async def compute_value(x):
     print(f"Function call compute_value({x})")
     return x**2